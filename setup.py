@@ -24,6 +24,9 @@ setup(
         "matplotlib",
         "graphviz",
     ],
+    extras_require={
+        "numba": ["numba"],
+    },
     packages=find_packages(),
     package_dir={"smart_choice": "smart_choice"},
     include_package_data=True,
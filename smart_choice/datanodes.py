@@ -136,7 +136,9 @@ class DataNodes:
             "maximize": maximize,
         }
 
-    def add_terminal(self, name: str, payoff_fn: Any = None) -> None:
+    def add_terminal(
+        self, name: str, payoff_fn: Any = None, vectorized: bool = False
+    ) -> None:
         """Adds a decision node to the bag.
 
         :param name:
@@ -147,11 +149,19 @@ class DataNodes:
             of the terminal node in the tree. The names of the created
             nodes must be used as the parameters of the function.
 
+        :param vectorized:
+            When `True`, `payoff_fn` is called once for the terminal nodes
+            with the same variables in their paths, with a NumPy array of
+            values for each variable, and must return an array with a value
+            for each node. NumPy arithmetic applies: integer values are
+            stored in fixed-width integers and can overflow without error.
+
         """
         self.data[name] = {
             "type": "TERMINAL",
             "payoff_fn": payoff_fn,
             "forced_branch": None,
+            "vectorized": vectorized,
         }
 
     def set_outcome(self, outcome, **conditions):
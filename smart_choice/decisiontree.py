@@ -20,19 +20,46 @@ sequence of use is the following:
 
 
 """
+
 import json
+import re
+from dataclasses import dataclass
 from typing import Any, Union, List
 import copy
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from graphviz import Digraph
 
 from .datanodes import DataNodes
 
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None
+
+_prange = range if numba is None else numba.prange
+
 NAMEMAXLEN = 15
 
+# Branch names in the text diagram of the tree
+_TAG_BRANCH_FMT = " {:<" + str(NAMEMAXLEN) + "s}"
+
+# Sentinel for absent dict entries
+_MISSING = object()
+
+#
+# Node type codes used in the array representation of the tree
+#
+TERMINAL = 0
+DECISION = 1
+CHANCE = 2
+
+_TYPE_CODE = {"TERMINAL": TERMINAL, "DECISION": DECISION, "CHANCE": CHANCE}
+
+# Letters of the node types in the text diagram, indexed by type code
+_TYPE_LETTER = ("T", "D", "C")
+
 
 def jitter(x):
     stdev = 0.002 * (max(x) - min(x))
@@ -46,6 +73,7 @@ def jitter(x):
 #
 #
 def _eval_utility_fn(value: float, utility_fn: str, risk_tolerance: float) -> float:
+    # `value` and `risk_tolerance` can be scalars or arrays
     if utility_fn is None:
         return value
     if utility_fn == "exp":
@@ -60,6 +88,7 @@ def _eval_utility_fn(value: float, utility_fn: str, risk_tolerance: float) -> fl
 
 
 def _eval_inv_utility_fn(value: float, utility_fn: str, risk_tolerance: float) -> float:
+    # `value` and `risk_tolerance` can be scalars or arrays
     if utility_fn is None:
         return value
     if utility_fn == "exp":
@@ -68,6 +97,263 @@ def _eval_inv_utility_fn(value: float, utility_fn: str, risk_tolerance: float) -
         return np.exp(value) - risk_tolerance
 
 
+# -------------------------------------------------------------------------
+#
+#
+#  A R R A Y    R E P R E S E N T A T I O N
+#
+#
+def _rollback_kernel(
+    type_code,
+    ev,
+    eu,
+    prob,
+    succ_flat,
+    succ_ptr,
+    forced_successor,
+    maximize,
+    optimal_successor,
+    use_exputl,
+):
+    #
+    # Bottom-up pass over the array representation of the tree. Computes
+    # the expected values (and expected utilities) of the internal nodes and
+    # the optimal successor of decision nodes and forced chance nodes.
+    # Successors have larger ids than their predecessor, so the nodes are
+    # visited from the last id to the first one.
+    #
+    for idx in range(len(type_code) - 1, -1, -1):
+
+        if type_code[idx] == TERMINAL:
+            continue
+
+        begin = succ_ptr[idx]
+        end = succ_ptr[idx + 1]
+
+        if forced_successor[idx] >= 0:
+            optimal = forced_successor[idx]
+            ev[idx] = ev[optimal]
+            eu[idx] = eu[optimal]
+            optimal_successor[idx] = optimal
+            continue
+
+        if type_code[idx] == CHANCE:
+            expval = 0.0
+            exputl = 0.0
+            for j in range(begin, end):
+                successor = succ_flat[j]
+                expval += prob[successor] * ev[successor]
+                if use_exputl:
+                    exputl += prob[successor] * eu[successor]
+            ev[idx] = expval
+            if use_exputl:
+                eu[idx] = exputl
+            continue
+
+        #
+        # Decision node: the first successor is the initial candidate and
+        # only a strictly better successor replaces it, so ties are resolved
+        # in favour of the first branch
+        #
+        criteria = eu if use_exputl else ev
+        node_maximize = maximize[idx]
+        optimal = succ_flat[begin]
+        optimal_criterion = criteria[optimal]
+        for j in range(begin + 1, end):
+            successor = succ_flat[j]
+            criterion = criteria[successor]
+            if (node_maximize and criterion > optimal_criterion) or (
+                not node_maximize and criterion < optimal_criterion
+            ):
+                optimal = successor
+                optimal_criterion = criterion
+
+        ev[idx] = ev[optimal]
+        eu[idx] = eu[optimal]
+        optimal_successor[idx] = optimal
+
+
+def _rollback_columns_kernel(
+    type_code,
+    prob,
+    ev,
+    eu,
+    succ_flat,
+    succ_ptr,
+    forced_successor,
+    maximize,
+    recompute,
+    use_exputl,
+):
+    #
+    # Bottom-up pass over several scenarios (columns of `ev` and `eu`) at
+    # once. `prob` has one column shared by all scenarios or a column for
+    # each scenario. Only the internal nodes flagged in `recompute` are
+    # computed. Scenarios are independent, so they are distributed over the
+    # available cores. Only compiled when numba is available; otherwise the
+    # rollback is done level by level with NumPy.
+    #
+    n_columns = ev.shape[1]
+    prob_stride = 0 if prob.shape[1] == 1 else 1
+    criteria = eu if use_exputl else ev
+
+    for k in _prange(n_columns):
+
+        k_prob = k * prob_stride
+
+        for idx in range(len(type_code) - 1, -1, -1):
+
+            if type_code[idx] == TERMINAL or not recompute[idx]:
+                continue
+
+            begin = succ_ptr[idx]
+            end = succ_ptr[idx + 1]
+
+            if forced_successor[idx] >= 0:
+                optimal = forced_successor[idx]
+                ev[idx, k] = ev[optimal, k]
+                if use_exputl:
+                    eu[idx, k] = eu[optimal, k]
+                continue
+
+            if type_code[idx] == CHANCE:
+                expval = 0.0
+                exputl = 0.0
+                for j in range(begin, end):
+                    successor = succ_flat[j]
+                    expval += prob[successor, k_prob] * ev[successor, k]
+                    if use_exputl:
+                        exputl += prob[successor, k_prob] * eu[successor, k]
+                ev[idx, k] = expval
+                if use_exputl:
+                    eu[idx, k] = exputl
+                continue
+
+            node_maximize = maximize[idx]
+            optimal = succ_flat[begin]
+            optimal_criterion = criteria[optimal, k]
+            for j in range(begin + 1, end):
+                successor = succ_flat[j]
+                criterion = criteria[successor, k]
+                if (node_maximize and criterion > optimal_criterion) or (
+                    not node_maximize and criterion < optimal_criterion
+                ):
+                    optimal = successor
+                    optimal_criterion = criterion
+            ev[idx, k] = ev[optimal, k]
+            if use_exputl:
+                eu[idx, k] = eu[optimal, k]
+
+
+def _strategy_kernel(
+    type_code,
+    prob,
+    succ_flat,
+    succ_ptr,
+    forced_successor,
+    optimal_successor,
+    optimal_strategy,
+    cum_prob,
+):
+    #
+    # Top-down pass over the array representation of the tree. Marks the
+    # nodes of the optimal strategy and computes the probability of reaching
+    # each node following it. Only compiled when numba is available;
+    # otherwise it runs as a plain Python loop over lists.
+    #
+    for idx in range(len(type_code)):
+
+        if type_code[idx] == TERMINAL:
+            continue
+
+        begin = succ_ptr[idx]
+        end = succ_ptr[idx + 1]
+
+        if type_code[idx] == CHANCE and forced_successor[idx] < 0:
+            for j in range(begin, end):
+                successor = succ_flat[j]
+                optimal_strategy[successor] = optimal_strategy[idx]
+                cum_prob[successor] = cum_prob[idx] * prob[idx]
+            continue
+
+        #
+        # Decision nodes and forced chance nodes: only the selected branch
+        # is reached; the probability of a forced branch is not applied
+        #
+        if type_code[idx] == DECISION:
+            selected = optimal_successor[idx]
+            reached = cum_prob[idx] * prob[idx]
+        else:
+            selected = forced_successor[idx]
+            reached = cum_prob[idx]
+        for j in range(begin, end):
+            successor = succ_flat[j]
+            if successor == selected:
+                optimal_strategy[successor] = optimal_strategy[idx]
+                cum_prob[successor] = reached
+            else:
+                optimal_strategy[successor] = False
+                cum_prob[successor] = 0.0
+
+
+if numba is not None:
+    _rollback_kernel = numba.njit(cache=True)(_rollback_kernel)
+    _strategy_kernel = numba.njit(cache=True)(_strategy_kernel)
+    _rollback_columns_kernel = numba.njit(cache=True, parallel=True)(
+        _rollback_columns_kernel
+    )
+
+
+# -------------------------------------------------------------------------
+#
+#
+#  G R A P H V I Z    O U T P U T
+#
+#
+_DOT_ID = re.compile(r"([a-zA-Z_][a-zA-Z0-9_]*|-?(\.[0-9]+|[0-9]+(\.[0-9]*)?))$")
+_DOT_KEYWORDS = {"node", "edge", "graph", "digraph", "subgraph", "strict"}
+_DOT_UNESCAPED_QUOTE = re.compile(r'(?<!\\)((?:\\{2})*)"')
+
+# Pen width of the branches outside (False) and in (True) the optimal strategy
+_PENWIDTH = ("1", "2")
+
+
+def _quote_dot(text: str) -> str:
+    """Quotes a DOT identifier when it is not a plain name or number."""
+    if _DOT_ID.match(text) and text.lower() not in _DOT_KEYWORDS:
+        return text
+    return '"' + _DOT_UNESCAPED_QUOTE.sub(r'\1\\"', text) + '"'
+
+
+@dataclass
+class _TreeArrays:
+    """Structure-of-arrays view of the tree nodes used by the rollback.
+
+    Successors are stored in CSR format: the successors of node `idx` are
+    `succ_flat[succ_ptr[idx] : succ_ptr[idx + 1]]`. The predecessor of the
+    root node is -1. The forced branch of a node is stored as the id of its
+    successor, or -1 when no branch is forced.
+
+    """
+
+    type_: np.ndarray
+    forced_successor: np.ndarray
+    maximize: np.ndarray
+    succ_ptr: np.ndarray
+    succ_flat: np.ndarray
+    predecessor: np.ndarray
+    prob: np.ndarray
+    ev: np.ndarray
+    eu: np.ndarray
+    optimal_successor: np.ndarray
+    optimal_strategy: np.ndarray
+    path_prob: np.ndarray
+    ce: np.ndarray
+    terminal_nodes: np.ndarray
+    decision_nodes: np.ndarray
+    chance_nodes: np.ndarray
+
+
 # -------------------------------------------------------------------------
 #
 #
@@ -92,15 +378,25 @@ class DecisionTree:
     def __init__(self, nodes: DataNodes) -> None:
 
         self._tree_nodes = None
+        self._structure = None
         self._data_nodes = nodes.copy()
         self._initial_variable = list(nodes.data.keys())[0]
 
+        ## version of the tree contents; changed by the methods that modify
+        ## the tree and used to invalidate the cache of plots
+        self._version: int = 0
+        self._plot_cache: dict = {}
+        self._plot_cache_version: int = -1
+
         ## Prepares the empty structure of the tree
         self.rebuild()
 
         ## run flags
         self._is_evaluated = False
         self._with_rollback = False
+        self._use_exputl_criterion = False
+        self._with_utility = False
+        self._risk_profiles = None
 
     # -------------------------------------------------------------------------
     #
@@ -112,7 +408,12 @@ class DecisionTree:
         """Creates a copy of the decision tree."""
         tree = DecisionTree(nodes=self._data_nodes.copy())
         tree._tree_nodes = copy.deepcopy(self._tree_nodes)
+        tree._arrays = copy.deepcopy(self._arrays)
         tree._initial_variable = self._initial_variable
+        tree._use_exputl_criterion = self._use_exputl_criterion
+        tree._is_evaluated = self._is_evaluated
+        tree._with_utility = self._with_utility
+        tree._version += 1
         return tree
 
     # -------------------------------------------------------------------------
@@ -121,14 +422,81 @@ class DecisionTree:
     #  T R E E    C R E A T I O N
     #
     #
-    def rebuild(self):
-        """Build  the tree using the structure information in the data nodes."""
-        self._build_skeleton()
+    def rebuild(self, force: bool = False):
+        """Build  the tree using the structure information in the data nodes.
+
+        :param force:
+            When `True`, the skeleton of the tree is built again even if the
+            structure of the data nodes has not changed.
+
+        """
+        self._version += 1
+        structure = self._structure_key()
+        if force or self._tree_nodes is None or structure != self._structure:
+            self._build_skeleton()
+            self._structure = structure
+        else:
+            self._reset_skeleton()
+
+        #
+        # The values of the nodes are removed, so the tree must be evaluated
+        # again, and the cached plots and risk profiles are discarded
+        #
+        self._is_evaluated = False
+        self._with_rollback = False
+        self._with_utility = False
+        self._risk_profiles = None
+        self._plot_cache = {}
+
         self._set_tag_attributes()
         self._set_payoff_fn()
         self._set_dependent_probability()
         self._set_dependent_outcomes()
 
+    def _structure_key(self) -> tuple:
+        #
+        # Information of the data nodes that determines the skeleton: the
+        # type of each node, the optimization criterion and the names and
+        # successors of the branches. Values and probabilities are not
+        # included, so they can change without rebuilding the skeleton.
+        #
+        return (self._initial_variable,) + tuple(
+            (
+                name,
+                data_node["type"],
+                data_node.get("maximize"),
+                tuple(
+                    (branch[0], branch[-1]) for branch in data_node.get("branches", ())
+                ),
+            )
+            for name, data_node in self._data_nodes.data.items()
+        )
+
+    def _reset_skeleton(self) -> None:
+        #
+        # Restores the nodes and arrays of the current skeleton to the state
+        # left by _build_skeleton()
+        #
+        for node in self._tree_nodes:
+            skeleton = {
+                key: node[key]
+                for key in ("name", "type", "forced_branch", "maximize", "successors")
+                if key in node
+            }
+            skeleton["forced_branch"] = None
+            node.clear()
+            node.update(skeleton)
+
+        arrays = self._arrays
+        arrays.forced_successor[:] = -1
+        arrays.prob[:] = np.nan
+        arrays.ev[:] = np.nan
+        arrays.eu[:] = np.nan
+        arrays.optimal_successor[:] = -1
+        arrays.optimal_strategy[:] = False
+        arrays.path_prob[:] = np.nan
+        arrays.ce[:] = np.nan
+
     def _build_skeleton(self) -> None:
         #
         # Builds a structure where nodes are:
@@ -137,127 +505,302 @@ class DecisionTree:
         #       {name: ..., type: ... successors: [ ... ]}
         #   ]
         #
-        def dispatch(name: str) -> int:
-            idx: int = len(self._tree_nodes)
-            type_: str = self._data_nodes[name]["type"]
-            self._tree_nodes.append(
-                {"name": name, "type": type_, "forced_branch": None}
-            )
-            if "maximize" in self._data_nodes[name].keys():
-                self._tree_nodes[idx]["maximize"] = self._data_nodes[name]["maximize"]
-            if "branches" in self._data_nodes[name].keys():
-                successors: list = []
-                for branch in self._data_nodes[name].get("branches"):
-                    successor: int = dispatch(name=branch[-1])
-                    successors.append(successor)
-                self._tree_nodes[idx]["successors"] = successors
-            return idx
-
+        # Nodes are numbered in depth-first preorder. The walk uses an
+        # explicit stack of (name, predecessor); the branches are pushed in
+        # reverse order so they are numbered in the order they are defined
         #
+        data_nodes: dict = self._data_nodes.data
         self._tree_nodes: list = []
-        dispatch(name=self._initial_variable)
+        tree_nodes = self._tree_nodes
+        stack: list = [(self._initial_variable, None)]
+        while stack:
+            name, predecessor = stack.pop()
+            idx: int = len(self._tree_nodes)
+            data_node: dict = data_nodes[name]
+            node: dict = {
+                "name": name,
+                "type": data_node["type"],
+                "forced_branch": None,
+            }
+            if "maximize" in data_node:
+                node["maximize"] = data_node["maximize"]
+            if "branches" in data_node:
+                node["successors"] = []
+                branches: list = data_node["branches"]
+                stack.extend((branch[-1], idx) for branch in reversed(branches))
+            tree_nodes.append(node)
+            if predecessor is not None:
+                tree_nodes[predecessor]["successors"].append(idx)
+
+        self._build_arrays()
+
+    def _build_arrays(self) -> None:
+        #
+        # Builds the structure-of-arrays representation of the skeleton
+        #
+        n_nodes: int = len(self._tree_nodes)
 
-    def _set_tag_attributes(self) -> None:
         #
-        # tag_value: is the value of the branch of the predecesor node
-        # tag_prob: is the probability of the branch of the predecesor (chance) node
+        # The skeleton is read in a single pass into lists, which are
+        # converted to arrays at once. Successors are stored in CSR format.
         #
-        for node in self._tree_nodes:
+        type_list: list = []
+        maximize_list: list = []
+        succ_flat_list: list = []
+        succ_ptr_list: list = [0]
+        predecessor_list: list = [-1] * n_nodes
+        nodes_by_type: tuple = ([], [], [])
+        for idx, node in enumerate(self._tree_nodes):
+            code = _TYPE_CODE[node["type"]]
+            type_list.append(code)
+            nodes_by_type[code].append(idx)
+            maximize_list.append(bool(node.get("maximize")))
+            successors = node.get("successors")
+            if successors:
+                succ_flat_list.extend(successors)
+                for successor in successors:
+                    predecessor_list[successor] = idx
+            succ_ptr_list.append(len(succ_flat_list))
 
-            if "successors" not in node.keys():
-                continue
+        type_ = np.array(type_list, dtype=np.int8)
 
-            name: str = node.get("name")
-            successors: list = node.get("successors")
-            type_: str = node.get("type")
-            branches: list = self._data_nodes[name].get("branches")
-
-            if type_ == "DECISION":
-                bnames = [x for x, _, _ in branches]
-                values = [x for _, x, _ in branches]
-                for successor, bname, value in zip(successors, bnames, values):
-                    self._tree_nodes[successor]["tag_branch"] = bname
-                    self._tree_nodes[successor]["tag_name"] = name
-                    self._tree_nodes[successor]["tag_value"] = value
-
-            if type_ == "CHANCE":
-                bnames = [x for x, _, _, _ in branches]
-                values = [x for _, _, x, _ in branches]
-                probs = [x for _, x, _, _ in branches]
-                for successor, bname, value, prob in zip(
-                    successors, bnames, values, probs
-                ):
-                    self._tree_nodes[successor]["tag_branch"] = bname
-                    self._tree_nodes[successor]["tag_name"] = name
-                    self._tree_nodes[successor]["tag_prob"] = prob
-                    self._tree_nodes[successor]["tag_value"] = value
+        #
+        # The arrays of results are rows of two blocks allocated at once
+        #
+        float_block = np.full((5, n_nodes), np.nan)
+        int_block = np.full((2, n_nodes), -1, dtype=np.int32)
+
+        self._arrays = _TreeArrays(
+            type_=type_,
+            forced_successor=int_block[0],
+            maximize=np.array(maximize_list, dtype=bool),
+            succ_ptr=np.array(succ_ptr_list, dtype=np.int32),
+            succ_flat=np.array(succ_flat_list, dtype=np.int32),
+            predecessor=np.array(predecessor_list, dtype=np.int32),
+            prob=float_block[0],
+            ev=float_block[1],
+            eu=float_block[2],
+            optimal_successor=int_block[1],
+            optimal_strategy=np.zeros(n_nodes, dtype=bool),
+            path_prob=float_block[3],
+            ce=float_block[4],
+            terminal_nodes=np.array(nodes_by_type[TERMINAL], dtype=np.intp),
+            decision_nodes=np.array(nodes_by_type[DECISION], dtype=np.intp),
+            chance_nodes=np.array(nodes_by_type[CHANCE], dtype=np.intp),
+        )
 
-    def _set_payoff_fn(self):
+        #
+        # The skeleton numbers the nodes in depth-first preorder, so the
+        # successors of a node have larger ids than the node and the CSR
+        # ranges follow the node ids. Sweeping the ids backwards visits the
+        # successors before their predecessor, which is the order used by
+        # the rollback. The internal nodes are kept in both orders as lists
+        # of ints for the Python loops that do not visit the terminal nodes.
+        #
+        self._internal_preorder = sorted(
+            nodes_by_type[DECISION] + nodes_by_type[CHANCE]
+        )
+        self._internal_postorder = self._internal_preorder[::-1]
 
-        for node in self._tree_nodes:
-            if node.get("type") == "TERMINAL":
-                name = node.get("name")
-                payoff_fn = self._data_nodes[name].get("payoff_fn")
-                node["payoff_fn"] = payoff_fn
+        #
+        # Without numba, the kernels run as plain Python loops over lists,
+        # so the arrays of the skeleton are also kept as lists; they are
+        # used as well by the Python loops over the nodes
+        #
+        self._skeleton_lists = (
+            type_list,
+            succ_flat_list,
+            succ_ptr_list,
+            maximize_list,
+        )
+        self._predecessor_list = predecessor_list
 
-    def _set_dependent_probability(self):
         #
-        def dispatch(
-            probability: float, conditions: dict, idx: int, args: dict
-        ) -> None:
+        # The levels and the terminal paths are only used by the NumPy
+        # rollback of several columns and by the partial evaluations, so
+        # they are built the first time they are needed
+        #
+        self._levels = None
+        self._terminal_paths = None
 
-            args = args.copy()
+    def _get_levels(self) -> list:
+        if self._levels is None:
+            self._levels = self._build_levels()
+        return self._levels
 
-            if "tag_name" in self._tree_nodes[idx].keys():
-                tag_name = self._tree_nodes[idx]["tag_name"]
-                tag_branch = self._tree_nodes[idx]["tag_branch"]
-                args = {**args, **{tag_name: tag_branch}}
+    def _get_terminal_paths(self) -> dict:
+        if self._terminal_paths is None:
+            self._terminal_paths = self._build_terminal_paths()
+        return self._terminal_paths
 
-            change: bool = True
+    def _build_levels(self) -> list:
+        #
+        # Groups the internal nodes by height (distance to the deepest
+        # terminal node below them): all the successors of a node in a level
+        # are in lower levels. For each level, stores the nodes and, for
+        # each branch rank j, the rows (positions in the level) of the nodes
+        # with a j-th successor and those successors. Used by the NumPy
+        # rollback. When all the nodes of the level have a j-th successor,
+        # the rows are a full slice, so the rank is computed with views
+        # instead of gathering and scattering the rows.
+        #
+        # The successors of the level are also stored as a matrix with a row
+        # for each node, padded with the first successor of the node, which
+        # is used to select the optimal branches.
+        #
+        succ_ptr = self._arrays.succ_ptr
+        succ_flat = self._arrays.succ_flat
+        n_nodes = len(self._tree_nodes)
+        counts = np.diff(succ_ptr)
+
+        height = np.zeros(n_nodes, dtype=np.int32)
+        for idx in range(n_nodes - 1, -1, -1):
+            if counts[idx] > 0:
+                successors = succ_flat[succ_ptr[idx] : succ_ptr[idx + 1]]
+                height[idx] = 1 + height[successors].max()
+
+        levels: list = []
+        for level in range(1, height.max(initial=0) + 1):
+            nodes = np.flatnonzero(height == level)
+            width = counts[nodes].max()
+            matrix = np.repeat(succ_flat[succ_ptr[nodes], np.newaxis], width, axis=1)
+            ranks: list = []
+            for rank in range(width):
+                rows = np.flatnonzero(counts[nodes] > rank)
+                if len(rows) == len(nodes):
+                    rows = slice(None)
+                successors = succ_flat[succ_ptr[nodes[rows]] + rank]
+                matrix[rows, rank] = successors
+                ranks.append((rows, successors))
+            levels.append((nodes, ranks, matrix))
+        return levels
+
+    def _build_terminal_paths(self) -> dict:
+        #
+        # Path of each terminal node as a tuple with the ids of the nodes from
+        # the successor of the root to the terminal node. The payoff function
+        # calls are grouped and batched with the paths instead of the kwargs
+        # dicts. They only depend on the skeleton, so they are kept across
+        # evaluations.
+        #
+        predecessor = self._predecessor_list
+        terminal_paths: dict = {}
+        for terminal in self._arrays.terminal_nodes.tolist():
+            path = []
+            idx = terminal
+            while idx > 0:
+                path.append(idx)
+                idx = predecessor[idx]
+            terminal_paths[terminal] = tuple(reversed(path))
+        return terminal_paths
+
+    def _children(self, idx: int) -> np.ndarray:
+        #
+        # Successors of the node `idx` as a view of the flat array
+        #
+        succ_ptr = self._arrays.succ_ptr
+        return self._arrays.succ_flat[succ_ptr[idx] : succ_ptr[idx + 1]]
 
-            for key in conditions.keys():
-                if not (key in args.keys() and conditions[key] == args[key]):
-                    change: bool = False
+    def _set_tag_attributes(self) -> None:
+        #
+        # tag_value: is the value of the branch of the predecesor node
+        # tag_prob: is the probability of the branch of the predecesor (chance) node
+        #
+        # _by_tag: tree nodes indexed by (tag_name, tag_branch)
+        #
+        self._by_tag: dict = {}
+        tree_nodes: list = self._tree_nodes
+        data_nodes: dict = self._data_nodes.data
+
+        type_code, succ_flat, succ_ptr, _ = self._skeleton_lists
+
+        for idx in self._internal_preorder:
+
+            type_: int = type_code[idx]
+            node: dict = tree_nodes[idx]
+            name: str = node["name"]
+            successors: list = succ_flat[succ_ptr[idx] : succ_ptr[idx + 1]]
+            branches: list = data_nodes[name].get("branches")
+
+            if type_ == DECISION:
+                for successor, (bname, value, _) in zip(successors, branches):
+                    child = tree_nodes[successor]
+                    child["tag_branch"] = bname
+                    child["tag_name"] = name
+                    child["tag_value"] = value
+                    self._by_tag.setdefault((name, bname), []).append(successor)
+
+            if type_ == CHANCE:
+                for successor, (bname, prob, value, _) in zip(successors, branches):
+                    child = tree_nodes[successor]
+                    child["tag_branch"] = bname
+                    child["tag_name"] = name
+                    child["tag_prob"] = prob
+                    child["tag_value"] = value
+                    self._by_tag.setdefault((name, bname), []).append(successor)
 
-            if change is True:
-                self._tree_nodes[idx]["tag_prob"] = probability
+    def _set_payoff_fn(self):
 
-            if "successors" in self._tree_nodes[idx].keys():
-                for successor in self._tree_nodes[idx]["successors"]:
-                    dispatch(probability, conditions, idx=successor, args=args)
+        data_nodes: dict = self._data_nodes.data
+        tree_nodes = self._tree_nodes
+        for idx in self._arrays.terminal_nodes.tolist():
+            node = tree_nodes[idx]
+            node["payoff_fn"] = data_nodes[node["name"]].get("payoff_fn")
 
+    def _walk_paths(self, attrs: tuple) -> list:
+        #
+        # For each tag attribute in `attrs`, returns a list with the dict of
+        # the values of the attribute in the path from the root to each
+        # node, indexed by the name of the variable. Nodes are numbered in
+        # preorder, so the dict of the predecessor of a node is built before
+        # the dict of the node; a node with the attribute gets a new dict,
+        # and a node without it shares the dict of its predecessor.
+        #
+        tree_nodes = self._tree_nodes
+        predecessor = self._predecessor_list
+        paths = []
+        for attr in attrs:
+            entries = [{}]
+            for idx in range(1, len(tree_nodes)):
+                node = tree_nodes[idx]
+                path = entries[predecessor[idx]]
+                if attr in node:
+                    path = path.copy()
+                    path[node["tag_name"]] = node[attr]
+                entries.append(path)
+            paths.append(entries)
+        return paths
+
+    def _apply_dependent_rules(self, rules: list, attr: str) -> None:
+        #
+        # Sets `attr` to the value of each rule in the nodes whose path
+        # matches all the conditions of the rule. All the rules are checked
+        # in a single walk against the shared dict of branches of the path,
+        # so no dict is copied; when several rules match a node, the last
+        # one wins.
+        #
+        tree_nodes = self._tree_nodes
+        rules = [(value, list(conditions.items())) for value, conditions in rules]
+        (paths,) = self._walk_paths(("tag_branch",))
+        for idx, branches in enumerate(paths):
+            for value, conditions in rules:
+                if all(
+                    branches.get(key, _MISSING) == branch for key, branch in conditions
+                ):
+                    tree_nodes[idx][attr] = value
+
+    def _set_dependent_probability(self):
         if self._data_nodes.dependent_probabilities is not None:
-            for probability, conditions in self._data_nodes.dependent_probabilities:
-                dispatch(probability, conditions, idx=0, args={})
+            self._apply_dependent_rules(
+                self._data_nodes.dependent_probabilities, attr="tag_prob"
+            )
 
     def _set_dependent_outcomes(self) -> None:
         """Set outcomes in a node dependent on previous nodes"""
-
-        def dispatch(outcome: float, conditions: dict, idx: int, args: dict) -> None:
-
-            args = args.copy()
-
-            if "tag_name" in self._tree_nodes[idx].keys():
-                tag_name = self._tree_nodes[idx]["tag_name"]
-                tag_branch = self._tree_nodes[idx]["tag_branch"]
-                args = {**args, **{tag_name: tag_branch}}
-
-            change: bool = True
-
-            for key in conditions.keys():
-                if not (key in args.keys() and conditions[key] == args[key]):
-                    change: bool = False
-
-            if change is True:
-                self._tree_nodes[idx]["tag_value"] = outcome
-
-            if "successors" in self._tree_nodes[idx].keys():
-                for successor in self._tree_nodes[idx]["successors"]:
-                    dispatch(outcome, conditions, idx=successor, args=args)
-
         if self._data_nodes.dependent_outcomes is not None:
-            for outcome, conditions in self._data_nodes.dependent_outcomes:
-                dispatch(outcome, conditions, idx=0, args={})
+            self._apply_dependent_rules(
+                self._data_nodes.dependent_outcomes, attr="tag_value"
+            )
 
     # -------------------------------------------------------------------------
     #
@@ -344,24 +887,17 @@ class DecisionTree:
         # Shows the tree structure
         #
         def adjust_width(column: List[str]) -> list:
-            maxwidth: int = max([len(txtline) for txtline in column]) + 2
-            formatstr: str = "{:<" + str(maxwidth) + "s}"
-            column: list = [formatstr.format(txtline) for txtline in column]
-            return column
+            maxwidth: int = max(map(len, column)) + 2
+            return [txtline.ljust(maxwidth) for txtline in column]
 
         def structure_colum() -> list:
 
             column: list = ["STRUCTURE", ""]
-            for i_node, node in enumerate(self._tree_nodes):
-                type_: str = node["type"]
-                code: str = (
-                    "D" if type_ == "DECISION" else "C" if type_ == "CHANCE" else "T"
-                )
-                successors: list = node.get("successors")
-                txtline: str = "{}{}".format(i_node, code)
-                if successors is not None:
-                    successors = [str(successor) for successor in successors]
-                    txtline += " ".join(successors)
+            for i_node, type_ in enumerate(self._arrays.type_.tolist()):
+                txtline: str = f"{i_node}{_TYPE_LETTER[type_]}"
+                if type_ != TERMINAL:
+                    successors = self._children(i_node).tolist()
+                    txtline += " ".join([str(successor) for successor in successors])
                 column.append(txtline)
             return column
 
@@ -371,68 +907,55 @@ class DecisionTree:
 
         def outcomes_column() -> list:
             column: list = []
-            for node in self._tree_nodes:
-                successors = node.get("successors")
-                if successors is not None:
-                    outcomes = [
-                        self._tree_nodes[successor].get("tag_value")
-                        for successor in successors
+            tree_nodes = self._tree_nodes
+            _, succ_flat, succ_ptr, _ = self._skeleton_lists
+            for idx in range(len(tree_nodes)):
+                column.append(
+                    [
+                        tree_nodes[successor].get("tag_value")
+                        for successor in succ_flat[succ_ptr[idx] : succ_ptr[idx + 1]]
                     ]
-                else:
-                    outcomes = []
-                column.append(outcomes)
+                )
 
-            maxwidth: int = max(
-                [len(str(txt)) for txtline in column for txt in txtline]
-            )
-            formatstr: str = "{:<" + str(maxwidth) + "s}"
+            #
+            # Rows are padded to the same width by adjust_width
+            #
+            column = [[str(txt) for txt in txtline] for txtline in column]
+            maxwidth: int = max(len(txt) for txtline in column for txt in txtline)
             column = [
-                [formatstr.format(str(txt)) for txt in txtline] for txtline in column
+                " ".join([txt.ljust(maxwidth) for txt in txtline]) for txtline in column
             ]
-            column: list = [" ".join(txtline) for txtline in column]
-            maxwidth: int = max([len(txtline) for txtline in column])
-            formatstr: str = "{:<" + str(maxwidth) + "s}"
-            column = [
-                formatstr.format("OUTCOMES"),
-                formatstr.format(""),
-            ] + column
-            return column
+            return ["OUTCOMES", ""] + column
 
         def probabilities_column() -> list:
+            #
+            # The probabilities are read from the tree nodes, so printing
+            # the tree does not modify it
+            #
             column: list = []
-            for node in self._tree_nodes:
-                type_: str = node["type"]
-                if type_ == "CHANCE":
-                    successors = node.get("successors")
+            tree_nodes = self._tree_nodes
+            type_code, succ_flat, succ_ptr, _ = self._skeleton_lists
+            for idx, type_ in enumerate(type_code):
+                if type_ == CHANCE:
                     probabilities = [
-                        self._tree_nodes[successor].get("tag_prob")
-                        for successor in successors
+                        float(tree_nodes[successor]["tag_prob"])
+                        for successor in succ_flat[succ_ptr[idx] : succ_ptr[idx + 1]]
                     ]
                 else:
                     probabilities = []
                 column.append(probabilities)
 
-            maxwidth: int = max(
-                [len(str(txt)) for txtline in column for txt in txtline]
-            )
-            formatstr: str = "{:<" + str(maxwidth) + "s}"
+            maxwidth: int = max(len(str(txt)) for txtline in column for txt in txtline)
             column = [
-                [
-                    formatstr.format("{:.4f}".format(prob))[1:]
-                    if prob < 1.0
-                    else "1.000"
-                    for prob in txtline
-                ]
+                " ".join(
+                    [
+                        f"{prob:.4f}".ljust(maxwidth)[1:] if prob < 1.0 else "1.000"
+                        for prob in txtline
+                    ]
+                )
                 for txtline in column
             ]
-            column: list = [" ".join(txtline) for txtline in column]
-            maxwidth: int = max([len(txtline) for txtline in column])
-            formatstr: str = "{:<" + str(maxwidth) + "s}"
-            column = [
-                formatstr.format("PROBABILIES"),
-                formatstr.format(""),
-            ] + column
-            return column
+            return ["PROBABILIES", ""] + column
 
         structure: list = adjust_width(structure_colum())
         names: list = adjust_width(names_column())
@@ -496,59 +1019,69 @@ class DecisionTree:
 
 
         """
+        type_code, succ_flat, succ_ptr, _ = self._skeleton_lists
+        tree_nodes = self._tree_nodes
+
+        #
+        # The maximum deep is invariant during the walk; when it is not
+        # given, the deep is unbounded
+        #
+        if max_deep is None:
+            max_deep = float("inf")
 
-        def display_node(
-            idx, is_first_node, is_last_node, is_optimal_choice, deep, max_deep
-        ):
+        def display_node(idx, is_first_node, is_last_node, is_optimal_choice, deep):
+            #
+            # Returns the lines of the node without its successors, the deep
+            # of the node and the width of its branch
             #
+            node = tree_nodes[idx]
+            type_ = type_code[idx]
+
             def prepare_text():
 
-                type_ = self._tree_nodes[idx].get("type")
-                tag_branch = self._tree_nodes[idx].get("tag_branch")
-                tag_prob = self._tree_nodes[idx].get("tag_prob")
-                tag_value = self._tree_nodes[idx].get("tag_value")
-                pathprob = self._tree_nodes[idx].get("PathProb")
-                expval = self._tree_nodes[idx].get("EV")
-                exputl = self._tree_nodes[idx].get("EU")
-                cequiv = self._tree_nodes[idx].get("CE")
+                tag_branch = node.get("tag_branch")
+                tag_prob = node.get("tag_prob")
+                tag_value = node.get("tag_value")
+                pathprob = node.get("PathProb")
+                expval = node.get("EV")
+                exputl = node.get("EU")
+                cequiv = node.get("CE")
 
                 text = ""
 
                 if tag_branch is not None:
                     if len(tag_branch) > NAMEMAXLEN:
                         tag_branch = tag_branch[: NAMEMAXLEN - 3] + "..."
-                    fmt = " {:<" + str(NAMEMAXLEN) + "s}"
-                    text += fmt.format(tag_branch)
+                    text += _TAG_BRANCH_FMT.format(tag_branch)
                 if tag_prob is not None:
-                    text += " " + "{:.4f}".format(tag_prob)[1:]
+                    text += " " + f"{tag_prob:.4f}"[1:]
                 if tag_value is not None:
-                    text += " {:8.2f}".format(tag_value)
+                    text += f" {tag_value:8.2f}"
 
-                if type_ == "TERMINAL" and (
+                if type_ == TERMINAL and (
                     exputl is not None or cequiv is not None or expval is not None
                 ):
                     text += " :"
                 if view == "eu" and exputl is not None:
-                    text += " {:8.2f}".format(exputl)
+                    text += f" {exputl:8.2f}"
                 if view == "ce" and cequiv is not None:
-                    text += " {:8.2f}".format(cequiv)
+                    text += f" {cequiv:8.2f}"
                 if view == "ev" and expval is not None:
-                    text += " {:8.2f}".format(expval)
+                    text += f" {expval:8.2f}"
                 if pathprob is not None:
-                    if pathprob == np.float64(1.0):
+                    if pathprob == 1.0:
                         text += " " + "1.000"
                     else:
-                        text += " " + "{:.4f}".format(pathprob)[1:]
+                        text += " " + f"{pathprob:.4f}"[1:]
 
                 return text
 
             # ---------------------------------------------------------------------------
-            type_ = self._tree_nodes[idx]["type"]
-            tag_name = self._tree_nodes[idx].get("tag_name")
+            tag_name = node.get("tag_name")
 
             # ---------------------------------------------------------------------------
             # vertical bar in the last node of terminals
-            if type_ == "TERMINAL":
+            if type_ == TERMINAL:
                 vbar = "\\" if is_last_node is True else "|"
             else:
                 vbar = "|"
@@ -565,16 +1098,14 @@ class DecisionTree:
 
             # ---------------------------------------------------------------------------
             # line between --------[?] and childrens
-            if type_ == "TERMINAL":
+            if type_ == TERMINAL:
                 text = []
             else:
                 if tag_name is not None:
                     if is_first_node is True:
-                        text = ["| {}".format(tag_name)]
-                    elif max_deep is None or (
-                        max_deep is not None and deep <= max_deep
-                    ):
-                        text = ["| {}".format(tag_name)]
+                        text = [f"| {tag_name}"]
+                    elif deep <= max_deep:
+                        text = [f"| {tag_name}"]
                     else:
                         text = []
                 else:
@@ -586,111 +1117,114 @@ class DecisionTree:
 
             # ---------------------------------------------------------------------------
             # Node -----------[?]
-            letter = "D" if type_ == "DECISION" else "C" if type_ == "CHANCE" else "T"
+            letter = _TYPE_LETTER[type_]
             len_branch_text = max(7, len(branch_text))
-            if type_ != "TERMINAL":
+            if type_ != TERMINAL:
                 if is_last_node is True:
-                    branch = (
-                        "\\"
-                        + "-" * (len_branch_text - 4)
-                        + "[{}] #{}".format(letter, idx)
-                    )
+                    branch = "\\" + "-" * (len_branch_text - 4) + f"[{letter}] #{idx}"
                 else:
-                    branch = (
-                        "+"
-                        + "-" * (len_branch_text - 4)
-                        + "[{}] #{}".format(letter, idx)
-                    )
+                    branch = "+" + "-" * (len_branch_text - 4) + f"[{letter}] #{idx}"
 
                 #
                 # Policy suggestion
                 #
-                if max_deep is None or (max_deep is not None and deep <= max_deep):
+                if deep <= max_deep:
                     text.append(branch)
 
+            return text, deep, len_branch_text
+
+        if self._with_rollback is False:
+            policy_suggestion = False
+
+        #
+        # Depth-first walk with an explicit stack. Each entry carries the
+        # prefix that indents the lines of the node and the header lines
+        # written before them
+        #
+        text = []
+        stack = [(idx, True, True, False, 0, "", [])]
+        while stack:
+            (
+                node_idx,
+                is_first_node,
+                is_last_node,
+                is_optimal_choice,
+                deep,
+                prefix,
+                header,
+            ) = stack.pop()
+
+            node_text, deep, len_branch_text = display_node(
+                node_idx, is_first_node, is_last_node, is_optimal_choice, deep
+            )
+            text.extend(header)
+            text.extend([prefix + line for line in node_text])
+
             # ---------------------------------------------------------------------------
             # successors
-            successors = self._tree_nodes[idx].get("successors")
+            type_ = type_code[node_idx]
+            successors = succ_flat[succ_ptr[node_idx] : succ_ptr[node_idx + 1]]
 
-            if successors is not None and (
-                max_deep is None or (max_deep is not None and deep <= max_deep)
-            ):
-                for successor in successors:
+            if not successors or deep > max_deep:
+                continue
 
-                    # -------------------------------------------------------------------
-                    # Mark optimal strategy
-                    optimal_strategy = self._tree_nodes[successor].get(
-                        "optimal_strategy"
-                    )
-                    is_optimal_choice = type_ == "DECISION" and optimal_strategy is True
+            # ---------------------------------------------------------------------------
+            # indents the childrens
+            vbar = " " if is_last_node else "|"
+            child_prefix = prefix + vbar + " " * (len_branch_text - 3)
 
-                    # -------------------------------------------------------------------
-                    # policy suggestion
-                    if optimal_strategy is False and policy_suggestion is True:
-                        continue
+            last_successor = len(successors) - 1
+            children = []
+            for i_successor, successor in enumerate(successors):
 
-                    # -------------------------------------------------------------------
-                    # vbar following the line of preious node
-                    if policy_suggestion is False:
-                        is_first_child_node = successor == successors[0]
-                        is_last_child_node = successor == successors[-1]
+                # -------------------------------------------------------------------
+                # Mark optimal strategy
+                successor_node = tree_nodes[successor]
+                optimal_strategy = successor_node.get("optimal_strategy")
+                is_optimal_choice = type_ == DECISION and optimal_strategy is True
 
+                # -------------------------------------------------------------------
+                # policy suggestion
+                if optimal_strategy is False and policy_suggestion is True:
+                    continue
+
+                # -------------------------------------------------------------------
+                # vbar following the line of preious node
+                if policy_suggestion is False:
+                    is_first_child_node = i_successor == 0
+                    is_last_child_node = i_successor == last_successor
+
+                else:
+                    if type_ == DECISION:
+                        is_first_child_node = True
+                        is_last_child_node = True
                     else:
-                        if type_ == "DECISION":
-                            is_first_child_node = True
-                            is_last_child_node = True
-                        else:
-                            is_first_child_node = successor == successors[0]
-                            is_last_child_node = successor == successors[-1]
-
-                    text_ = display_node(
+                        is_first_child_node = i_successor == 0
+                        is_last_child_node = i_successor == last_successor
+
+                # ---------------------------------------------------------------------------
+                # Adds a vertical bar as first element of a terminal node sequence
+                header = []
+                if type_code[successor] == TERMINAL and i_successor == 0:
+                    successor_tag_name = successor_node.get("tag_name")
+                    if successor_tag_name is not None:
+                        header = [child_prefix + f"| {successor_tag_name}"]
+                    else:
+                        header = [child_prefix + "|"]
+
+                children.append(
+                    (
                         successor,
                         is_first_child_node,
                         is_last_child_node,
                         is_optimal_choice,
                         deep,
-                        max_deep,
+                        child_prefix,
+                        header,
                     )
+                )
 
-                    vbar = " " if is_last_node else "|"
-
-                    # ---------------------------------------------------------------------------
-                    # indents the childrens
-                    text_ = [
-                        vbar + " " * (len_branch_text - 3) + line for line in text_
-                    ]
-
-                    # ---------------------------------------------------------------------------
-                    # Adds a vertical bar as first element of a terminal node sequence
-                    successor_type = self._tree_nodes[successor]["type"]
-                    if successor_type == "TERMINAL" and successor == successors[0]:
-                        successor_tag_name = self._tree_nodes[successor].get("tag_name")
-                        if successor_tag_name is not None:
-                            text.extend(
-                                [
-                                    vbar
-                                    + " " * (len_branch_text - 3)
-                                    + "| {}".format(successor_tag_name)
-                                ]
-                            )
-                        else:
-                            text.extend([vbar + " " * (len_branch_text - 3) + "|"])
-
-                    text.extend(text_)
-
-            return text
-
-        if self._with_rollback is False:
-            policy_suggestion = False
-
-        text = display_node(
-            idx=idx,
-            is_first_node=True,
-            is_last_node=True,
-            is_optimal_choice=False,
-            deep=0,
-            max_deep=max_deep,
-        )
+            stack.extend(reversed(children))
 
         text = [line.rstrip() for line in text]
 
@@ -706,63 +1240,164 @@ class DecisionTree:
         #
         # Builts kwargs for user function in terminal nodes
         #
-        def dispatch(idx: int, args: dict, probs: dict, branches: dict) -> None:
-
-            args = args.copy()
-
-            if "tag_name" in self._tree_nodes[idx].keys():
-                name = self._tree_nodes[idx]["tag_name"]
-
-            if "tag_value" in self._tree_nodes[idx].keys():
-                value = self._tree_nodes[idx]["tag_value"]
-                args = {**args, **{name: value}}
-
-            if "tag_prob" in self._tree_nodes[idx].keys():
-                prob = self._tree_nodes[idx]["tag_prob"]
-                probs = {**probs, **{name: prob}}
+        tree_nodes = self._tree_nodes
+        args, probs, branches = self._walk_paths(
+            ("tag_value", "tag_prob", "tag_branch")
+        )
+        for idx in self._arrays.terminal_nodes.tolist():
+            node = tree_nodes[idx]
+            node["payoff_fn_args"] = args[idx].copy()
+            node["payoff_fn_probs"] = probs[idx].copy()
+            node["payoff_fn_branches"] = branches[idx].copy()
 
-            if "tag_branch" in self._tree_nodes[idx].keys():
-                branch = self._tree_nodes[idx]["tag_branch"]
-                branches = {**branches, **{name: branch}}
+    def _compute_payoff_fn(self, terminal_nodes: list = None):
+        #
+        # Compute payoff_fn in terminal nodes (all of them, or the ones in
+        # `terminal_nodes`); the values are stored in the nodes and in the
+        # array representation. The payoff functions of terminals added with
+        # `vectorized=True` are called once for each group of terminal nodes
+        # with the same variables in their paths.
+        #
+        tree_nodes = self._tree_nodes
+        data_nodes = self._data_nodes.data
+        if terminal_nodes is None:
+            terminal_nodes = self._arrays.terminal_nodes.tolist()
+
+        ev = self._arrays.ev
+        vectorized: list = []
+        for idx in terminal_nodes:
+            node = tree_nodes[idx]
+            if data_nodes[node["name"]].get("vectorized") is True:
+                vectorized.append(idx)
+                continue
+            payoff_fn_args = node.get("payoff_fn_args")
+            payoff_fn_probs = node.get("payoff_fn_probs")
+            payoff_fn_branches = node.get("payoff_fn_branches")
+            payoff_fn = node.get("payoff_fn")
+            node["EV"] = payoff_fn(
+                values=payoff_fn_args,
+                probabilities=payoff_fn_probs,
+                branches=payoff_fn_branches,
+            )
+            ev[idx] = node["EV"]
 
-            type_ = self._tree_nodes[idx].get("type")
+        if not vectorized:
+            return
 
-            if type_ == "TERMINAL":
-                self._tree_nodes[idx]["payoff_fn_args"] = args
-                self._tree_nodes[idx]["payoff_fn_probs"] = probs
-                self._tree_nodes[idx]["payoff_fn_branches"] = branches
-                return
+        #
+        # The variables of a path, and the types of their values, are given
+        # by the tag attributes of the nodes in the path, so each node is
+        # coded once and the paths are compared as tuples of codes.
+        #
+        codes: dict = {}
+        node_code = [
+            codes.setdefault(
+                (
+                    node.get("tag_name"),
+                    type(node.get("tag_value", _MISSING)),
+                    type(node.get("tag_prob", _MISSING)),
+                    "tag_branch" in node,
+                ),
+                len(codes),
+            )
+            for node in tree_nodes
+        ]
 
-            if "successors" in self._tree_nodes[idx].keys():
-                for successor in self._tree_nodes[idx]["successors"]:
-                    dispatch(idx=successor, args=args, probs=probs, branches=branches)
+        terminal_paths = self._get_terminal_paths()
+        groups: dict = {}
+        for idx in vectorized:
+            path = terminal_paths[idx]
+            signature = (
+                tree_nodes[idx]["name"],
+                tuple(node_code[j] for j in path),
+            )
+            groups.setdefault(signature, []).append(idx)
 
-        dispatch(idx=0, args={}, probs={}, branches={})
+        for group in groups.values():
+            self._compute_vectorized_payoff_fn(group)
 
-    def _compute_payoff_fn(self):
+    def _compute_vectorized_payoff_fn(self, group: list) -> None:
         #
-        # Compute payoff_fn in terminal nodes
+        # Calls the payoff function once with arrays of values for the
+        # terminal nodes in `group`
         #
+        tree_nodes = self._tree_nodes
+        nodes = [tree_nodes[idx] for idx in group]
 
-        for node in self._tree_nodes:
-
-            if node.get("type") == "TERMINAL":
-                payoff_fn_args = node.get("payoff_fn_args")
-                payoff_fn_probs = node.get("payoff_fn_probs")
-                payoff_fn_branches = node.get("payoff_fn_branches")
-                payoff_fn = node.get("payoff_fn")
-                node["EV"] = payoff_fn(
-                    values=payoff_fn_args,
-                    probabilities=payoff_fn_probs,
-                    branches=payoff_fn_branches,
+        #
+        # The nodes of the group have paths with the same variables in the
+        # same order, so the k-th nodes of the paths are tagged with the
+        # same variable
+        #
+        terminal_paths = self._get_terminal_paths()
+        columns = list(zip(*(terminal_paths[idx] for idx in group)))
+
+        def stack(attr: str) -> dict:
+            stacked: dict = {}
+            for column in columns:
+                node = tree_nodes[column[0]]
+                if attr in node:
+                    stacked[node["tag_name"]] = np.array(
+                        [tree_nodes[j][attr] for j in column]
+                    )
+            return stacked
+
+        payoff_fn = nodes[0].get("payoff_fn")
+        expected_values = np.asarray(
+            payoff_fn(
+                values=stack("tag_value"),
+                probabilities=stack("tag_prob"),
+                branches=stack("tag_branch"),
+            )
+        )
+        if expected_values.shape != (len(nodes),):
+            raise ValueError(
+                "Vectorized payoff function of {} must return {} values".format(
+                    nodes[0]["name"], len(nodes)
                 )
+            )
+
+        for node, expected_value in zip(nodes, expected_values.tolist()):
+            node["EV"] = expected_value
+        self._arrays.ev[group] = expected_values
 
     def evaluate(self) -> None:
         """Calculates the values at the end of the tree (terminal nodes)."""
 
+        self._version += 1
         self._generate_paths()
         self._compute_payoff_fn()
         self._is_evaluated = True
+        self._risk_profiles = None
+
+    def _set_tag_values(self, nodes: list, value) -> None:
+        #
+        # Sets the value of the branches of `nodes` and evaluates again only
+        # the terminal nodes whose paths pass through them; the other
+        # terminal nodes keep their values. The whole tree is evaluated
+        # when it has not been evaluated yet.
+        #
+        tree_nodes = self._tree_nodes
+        nodes = set(nodes)
+        for idx in nodes:
+            tree_nodes[idx]["tag_value"] = value
+
+        if self._is_evaluated is False:
+            self.evaluate()
+            return
+
+        terminal_nodes = []
+        for terminal, path in self._get_terminal_paths().items():
+            if nodes.isdisjoint(path):
+                continue
+            payoff_fn_args = tree_nodes[terminal]["payoff_fn_args"]
+            for idx in nodes.intersection(path):
+                payoff_fn_args[tree_nodes[idx]["tag_name"]] = value
+            terminal_nodes.append(terminal)
+
+        self._version += 1
+        self._compute_payoff_fn(terminal_nodes)
+        self._risk_profiles = None
 
     # -------------------------------------------------------------------------
     #
@@ -807,6 +1442,11 @@ class DecisionTree:
 
 
         """
+        if self._is_evaluated is False:
+            raise ValueError(
+                "The tree must be evaluated before the rollback; call evaluate()"
+            )
+
         if utility_fn is not None:
             self._payoff_to_utility(
                 utility_fn=utility_fn, risk_tolerance=risk_tolerance
@@ -817,7 +1457,6 @@ class DecisionTree:
         self._rollback_tree(use_exputl_criterion=utility_fn is not None)
 
         self._compute_optimal_strategy()
-        self._compute_path_probabilities()
 
         if utility_fn is not None:
             self._compute_certainty_equivalents(
@@ -825,6 +1464,7 @@ class DecisionTree:
             )
 
         self._with_rollback = True
+        self._version += 1
 
         result = self._tree_nodes[0].get("EV")
         if utility_fn is not None:
@@ -839,206 +1479,503 @@ class DecisionTree:
     # Auxiliary functions
     #
     def _payoff_to_utility(self, utility_fn: str, risk_tolerance: float) -> None:
-        for node in self._tree_nodes:
-            if node.get("type") == "TERMINAL":
-                expected_val = node.get("EV")
-                node["EU"] = _eval_utility_fn(
-                    value=expected_val,
-                    utility_fn=utility_fn,
-                    risk_tolerance=risk_tolerance,
-                )
+        #
+        # The utility function is evaluated once for the values of all
+        # terminal nodes; the utilities are stored in the nodes and in the
+        # array representation
+        #
+        tree_nodes = self._tree_nodes
+        terminal_nodes = self._arrays.terminal_nodes
+        expected_utilities = _eval_utility_fn(
+            value=self._arrays.ev[terminal_nodes],
+            utility_fn=utility_fn,
+            risk_tolerance=risk_tolerance,
+        )
+        self._arrays.eu[terminal_nodes] = expected_utilities
+        self._with_utility = True
+        for idx, expected_utility in zip(terminal_nodes.tolist(), expected_utilities):
+            tree_nodes[idx]["EU"] = expected_utility
 
     def _delete_utility_values(self) -> None:
+        #
+        # Utilities are only stored by _payoff_to_utility() and the
+        # rollbacks that follow it
+        #
+        if self._with_utility is False:
+            return
         for node in self._tree_nodes:
             node.pop("EU", None)
             node.pop("CE", None)
+        self._arrays.eu[:] = np.nan
+        self._arrays.ce[:] = np.nan
+        self._with_utility = False
 
-    def _rollback_tree(self, use_exputl_criterion: bool) -> None:
+    def _load_probabilities(self) -> None:
+        # missing probabilities (None) are stored as NaN
+        self._arrays.prob[:] = [node.get("tag_prob") for node in self._tree_nodes]
+
+    def _load_forced_branches(self) -> None:
+        #
+        # The forced branch of a node can be set in the tree node at any
+        # time, so it is resolved to the id of the forced successor before
+        # each rollback
+        #
+        tree_nodes = self._tree_nodes
+        forced_successor = self._arrays.forced_successor
+        forced_successor[:] = -1
+        for idx in self._internal_preorder:
+            node = tree_nodes[idx]
+            forced_branch = node.get("forced_branch")
+            if forced_branch is not None:
+                forced_successor[idx] = node["successors"][forced_branch]
+
+    def _rollback_tree(
+        self, use_exputl_criterion: bool, compute_risk_profile: bool = False
+    ) -> None:
         #
         # Computes the expected values at internal tree nodes.
         # At this point, expected values in terminal nodes are already
-        # computed
+        # computed.
         #
-        def decision_node(idx: int) -> None:
-
-            ## evaluate successors
-            successors: list = self._tree_nodes[idx].get("successors")
-            for i_successor, successor in enumerate(successors):
-                dispatch(idx=successor)
+        # When `compute_risk_profile` is True, the risk profile of each node
+        # is computed in the same pass as a pair of arrays (values, probs)
+        # sorted by value.
+        #
+        arrays = self._arrays
+        type_ = arrays.type_
+        succ_ptr = arrays.succ_ptr
+        succ_flat = arrays.succ_flat
+        forced_successor = arrays.forced_successor
+        maximize = arrays.maximize
+        prob = arrays.prob
+        ev = arrays.ev
+        eu = arrays.eu
+        optimal_successor = arrays.optimal_successor
 
-            ## forced branch as index
-            forced_branch: int = self._tree_nodes[idx].get("forced_branch")
+        #
+        # Loads the probabilities of the branches. The expected values and
+        # utilities of the terminal nodes are stored in the array
+        # representation by evaluate() and rollback()
+        #
+        self._load_probabilities()
+        self._load_forced_branches()
+
+        optimal_successor[:] = -1
+        if numba is not None:
+            _rollback_kernel(
+                type_,
+                ev,
+                eu,
+                prob,
+                succ_flat,
+                succ_ptr,
+                forced_successor,
+                maximize,
+                optimal_successor,
+                use_exputl_criterion,
+            )
+            ev_list = ev.tolist()
+            eu_list = eu.tolist()
+            optimal_list = optimal_successor.tolist()
+        else:
+            #
+            # Without numba the kernel is a plain Python loop, which is
+            # faster over lists than over NumPy scalars
+            #
+            (
+                type_list,
+                succ_flat_list,
+                succ_ptr_list,
+                maximize_list,
+            ) = self._skeleton_lists
+            ev_list = ev.tolist()
+            eu_list = eu.tolist()
+            optimal_list = optimal_successor.tolist()
+            _rollback_kernel(
+                type_list,
+                ev_list,
+                eu_list,
+                prob.tolist(),
+                succ_flat_list,
+                succ_ptr_list,
+                forced_successor.tolist(),
+                maximize_list,
+                optimal_list,
+                use_exputl_criterion,
+            )
+            ev[:] = ev_list
+            eu[:] = eu_list
+            optimal_successor[:] = optimal_list
 
-            optimal_expval: float = None
-            optimal_exputl: float = None
-            optimal_criterion: float = None
-            optimal_successor: int = None
+        #
+        # Risk profiles: decision nodes and forced chance nodes share the
+        # profile of the optimal successor; chance nodes merge the profiles
+        # of their successors weighted by the branch probabilities
+        #
+        risk_profiles: list = None
+        if compute_risk_profile is True:
+            risk_profiles = [None] * len(self._tree_nodes)
+            for idx in arrays.terminal_nodes.tolist():
+                risk_profiles[idx] = (
+                    np.array([self._tree_nodes[idx]["EV"]]),
+                    np.array([1.0]),
+                )
 
-            if forced_branch is None:
+            for idx in self._internal_postorder:
 
-                maximize: bool = self._tree_nodes[idx].get("maximize")
-                optimal_criterion: float = 0
+                if optimal_list[idx] >= 0:
+                    risk_profiles[idx] = risk_profiles[optimal_list[idx]]
+                    continue
 
-                for i_successor, successor in enumerate(successors):
+                successors = succ_flat[succ_ptr[idx] : succ_ptr[idx + 1]]
+                values = np.concatenate(
+                    [risk_profiles[successor][0] for successor in successors]
+                )
+                weighted_probs = np.concatenate(
+                    [
+                        prob[successor] * risk_profiles[successor][1]
+                        for successor in successors
+                    ]
+                )
+                unique_values, inverse = np.unique(values, return_inverse=True)
+                node_probs = np.bincount(
+                    inverse, weights=weighted_probs, minlength=len(unique_values)
+                )
+                risk_profiles[idx] = (unique_values, node_probs)
 
-                    expval = self._tree_nodes[successor].get("EV")
-                    exputl = self._tree_nodes[successor].get("EU")
+        self._use_exputl_criterion = use_exputl_criterion
+        self._risk_profiles = risk_profiles
 
-                    if use_exputl_criterion is True:
-                        criterion = exputl
-                    else:
-                        criterion = expval
-
-                    update = False
-                    if i_successor == 0:
-                        update = True
-                    if maximize is True and criterion > optimal_criterion:
-                        update = True
-                    if maximize is False and criterion < optimal_criterion:
-                        update = True
-                    if update is True:
-                        optimal_expval = expval
-                        optimal_exputl = exputl
-                        optimal_successor = successor
-                        optimal_criterion = criterion
+        #
+        # Copies the results back to the tree nodes. Decision nodes and
+        # forced chance nodes take the values of the selected successor as
+        # they are stored in it, so successors are copied before their
+        # predecessor
+        #
+        tree_nodes = self._tree_nodes
+        type_list = self._skeleton_lists[0]
+        for idx in self._internal_postorder:
+            node = tree_nodes[idx]
+            optimal = optimal_list[idx]
+            if optimal >= 0:
+                optimal_node = tree_nodes[optimal]
+                node["EV"] = optimal_node["EV"]
+                if use_exputl_criterion is True:
+                    node["EU"] = optimal_node["EU"]
             else:
-                optimal_successor = successors[forced_branch]
-                optimal_expval = self._tree_nodes[optimal_successor].get("EV")
-                optimal_exputl = self._tree_nodes[optimal_successor].get("EU")
+                node["EV"] = ev_list[idx]
+                if use_exputl_criterion is True:
+                    node["EU"] = eu_list[idx]
+            if type_list[idx] == DECISION:
+                node["optimal_successor"] = optimal
 
-            self._tree_nodes[idx]["EV"] = optimal_expval
-            if use_exputl_criterion is True:
-                self._tree_nodes[idx]["EU"] = optimal_exputl
-            self._tree_nodes[idx]["optimal_successor"] = optimal_successor
+    def _risk_profile(self, idx: int) -> tuple:
+        #
+        # Risk profile of the node `idx` as (values, probs). Profiles are
+        # computed on demand and cached until the next evaluation or rollback
+        #
+        if self._risk_profiles is None:
+            self._rollback_tree(
+                use_exputl_criterion=self._use_exputl_criterion,
+                compute_risk_profile=True,
+            )
+        return self._risk_profiles[idx]
 
-        def chance_node(idx: int) -> None:
+    def _rollback_columns(
+        self,
+        prob: np.ndarray,
+        ev: np.ndarray,
+        eu: np.ndarray = None,
+        recompute: np.ndarray = None,
+    ) -> None:
+        #
+        # Rollback of several scenarios at once. `ev` (and `eu`) are matrices
+        # with a row for each node and a column for each scenario, with the
+        # values of the terminal nodes already set; `prob` are the branch
+        # probabilities, with one column or a column for each scenario.
+        # Decision nodes use the expected utility as criterion when `eu`
+        # is given. Internal rows are computed in place; when `recompute` is
+        # given, only the rows of the flagged nodes are computed and the
+        # other rows must already hold their values.
+        #
+        self._load_forced_branches()
+        arrays = self._arrays
+        type_ = arrays.type_
+        succ_ptr = arrays.succ_ptr
+        succ_flat = arrays.succ_flat
+        forced_successor = arrays.forced_successor
+        maximize = arrays.maximize
+
+        if numba is not None:
+            _rollback_columns_kernel(
+                type_,
+                prob,
+                ev,
+                ev if eu is None else eu,
+                succ_flat,
+                succ_ptr,
+                forced_successor,
+                maximize,
+                np.ones(len(type_), dtype=bool) if recompute is None else recompute,
+                eu is not None,
+            )
+            return
 
-            ## evaluate successors
-            successors: list = self._tree_nodes[idx].get("successors")
-            for successor in successors:
-                dispatch(idx=successor)
+        self._rollback_levels(prob=prob, ev=ev, eu=eu, recompute=recompute)
 
-            forced_branch: int = self._tree_nodes[idx].get("forced_branch")
-            node_expval: float = 0
-            node_exputl: float = 0
+    def _rollback_levels(
+        self,
+        prob: np.ndarray,
+        ev: np.ndarray,
+        eu: np.ndarray = None,
+        optimal_successor: np.ndarray = None,
+        recompute: np.ndarray = None,
+    ) -> None:
+        #
+        # NumPy version of the rollback kernels, used when numba is not
+        # available. The nodes of a level are computed at once, one branch
+        # rank at a time, so the sums and comparisons are done in the same
+        # order as in the kernels and give the same results. The arguments
+        # are as in `_rollback_columns`; the optimal successors of decision
+        # and forced chance nodes are stored in `optimal_successor` (for the
+        # first column) when it is given. Levels without nodes flagged in
+        # `recompute` are skipped.
+        #
+        arrays = self._arrays
+        criteria = ev if eu is None else eu
+        n_columns = ev.shape[1]
+        columns = np.arange(n_columns)
 
-            if forced_branch is None:
-                for successor in successors:
-                    prob: float = self._tree_nodes[successor].get("tag_prob")
-                    expval: float = self._tree_nodes[successor].get("EV")
-                    node_expval += prob * expval
-                    if use_exputl_criterion:
-                        exputl: float = self._tree_nodes[successor].get("EU")
-                        node_exputl += prob * exputl
-            else:
-                optimal_successor = successors[forced_branch]
-                node_expval = self._tree_nodes[optimal_successor].get("EV")
-                node_exputl = self._tree_nodes[optimal_successor].get("EU")
+        for nodes, ranks, matrix in self._get_levels():
 
-            self._tree_nodes[idx]["EV"] = node_expval
-            if use_exputl_criterion is True:
-                self._tree_nodes[idx]["EU"] = node_exputl
+            if recompute is not None and not recompute[nodes].any():
+                continue
 
-        def dispatch(idx: int) -> None:
-            type_: str = self._tree_nodes[idx].get("type")
-            if type_ == "DECISION":
-                decision_node(idx=idx)
-            if type_ == "CHANCE":
-                chance_node(idx=idx)
+            n_nodes = len(nodes)
+            forced_successor = arrays.forced_successor[nodes]
+            chance = (arrays.type_[nodes] == CHANCE) & (forced_successor < 0)
+            selection = ~chance
 
-        dispatch(idx=0)
+            #
+            # Chance nodes: expected values weighted by the probabilities
+            #
+            if chance.any():
+                expval = np.zeros((n_nodes, n_columns))
+                if eu is not None:
+                    exputl = np.zeros((n_nodes, n_columns))
+                for rows, successors in ranks:
+                    probs = prob[successors, :]
+                    expval[rows, :] += probs * ev[successors, :]
+                    if eu is not None:
+                        exputl[rows, :] += probs * eu[successors, :]
+                ev[nodes[chance], :] = expval[chance, :]
+                if eu is not None:
+                    eu[nodes[chance], :] = exputl[chance, :]
+
+            if not selection.any():
+                continue
 
-    def _compute_optimal_strategy(self) -> None:
+            #
+            # Decision nodes: the optimal branch is the first one with the
+            # maximum (or minimum) criterion, found with argmax over the
+            # successors matrix; the criteria of minimized nodes are negated.
+            # As in the kernels, NaN criteria are never selected unless the
+            # first branch is NaN, which is then kept.
+            #
+            rows = np.flatnonzero(selection)
+            candidates = matrix[rows, :]
+            criterion = criteria[candidates, :]
+            sign = np.where(arrays.maximize[nodes[rows]], 1.0, -1.0)
+            score = sign[:, np.newaxis, np.newaxis] * criterion
+            score[np.isnan(score)] = -np.inf
+            best = score.argmax(axis=1)
+            best[np.isnan(criterion[:, 0, :])] = 0
+
+            optimal = candidates[np.arange(len(rows))[:, np.newaxis], best]
+            forced = forced_successor[rows] >= 0
+            optimal[forced, :] = forced_successor[rows][forced, np.newaxis]
+            ev[nodes[selection], :] = ev[optimal, columns]
+            if eu is not None:
+                eu[nodes[selection], :] = eu[optimal, columns]
+            if optimal_successor is not None:
+                optimal_successor[nodes[selection]] = optimal[:, 0]
+
+    def _terminal_values(self, n_columns: int) -> np.ndarray:
         #
-        def terminal_node(idx: int, optimal_strategy: bool) -> None:
-            self._tree_nodes[idx]["optimal_strategy"] = optimal_strategy
+        # Matrix of expected values with the values of the terminal nodes
+        # repeated in `n_columns` columns
+        #
+        terminal_nodes = self._arrays.terminal_nodes
+        ev = np.full((len(self._tree_nodes), n_columns), np.nan)
+        ev[terminal_nodes, :] = self._arrays.ev[terminal_nodes, np.newaxis]
+        return ev
+
+    def _rollback_certainty_equivalents(
+        self, utility_fn: str, risk_tolerances: np.ndarray
+    ) -> np.ndarray:
+        #
+        # Rollback of the tree for several risk tolerances at once. Returns
+        # a matrix with the certainty equivalent of each node (rows) for each
+        # risk tolerance (columns). The tree nodes are not modified.
+        #
+        # An infinite risk tolerance is a risk neutral decision-maker: the
+        # utility is the value itself and the certainty equivalent is the
+        # expected value.
+        #
+        terminal_nodes = self._arrays.terminal_nodes
+        self._load_probabilities()
 
-        def chance_node(idx: int, optimal_strategy: bool) -> None:
-            self._tree_nodes[idx]["optimal_strategy"] = optimal_strategy
-            forced_branch: int = self._tree_nodes[idx].get("forced_branch")
-            successors = self._tree_nodes[idx].get("successors")
-            if forced_branch is None:
-                for successor in successors:
-                    dispatch(idx=successor, optimal_strategy=optimal_strategy)
-            else:
-                for i_successor, successor in enumerate(successors):
-                    if i_successor == forced_branch:
-                        dispatch(idx=successor, optimal_strategy=optimal_strategy)
-                    else:
-                        dispatch(idx=successor, optimal_strategy=False)
+        risk_tolerances = np.asarray(risk_tolerances, dtype=np.float64)
+        risk_neutral = np.isinf(risk_tolerances)
+        risk_averse = ~risk_neutral
 
-        def decision_node(idx: int, optimal_strategy: bool) -> None:
-            self._tree_nodes[idx]["optimal_strategy"] = optimal_strategy
-            successors = self._tree_nodes[idx].get("successors")
-            optimal_successor = self._tree_nodes[idx].get("optimal_successor")
-            for successor in successors:
-                if successor == optimal_successor:
-                    dispatch(idx=successor, optimal_strategy=optimal_strategy)
-                else:
-                    dispatch(idx=successor, optimal_strategy=False)
+        #
+        # The utility function and its inverse are only evaluated in the
+        # columns of finite risk tolerances; the risk neutral columns take
+        # the expected values
+        #
+        ev = self._terminal_values(len(risk_tolerances))
+        eu = np.full(ev.shape, np.nan)
+        eu[:, risk_neutral] = ev[:, risk_neutral]
+        terminal_columns = np.ix_(terminal_nodes, risk_averse)
+        eu[terminal_columns] = _eval_utility_fn(
+            value=ev[terminal_columns],
+            utility_fn=utility_fn,
+            risk_tolerance=risk_tolerances[np.newaxis, risk_averse],
+        )
 
-        def dispatch(idx: int, optimal_strategy: bool) -> None:
-            type_: str = self._tree_nodes[idx].get("type")
-            if type_ == "TERMINAL":
-                terminal_node(idx=idx, optimal_strategy=optimal_strategy)
-            if type_ == "DECISION":
-                decision_node(idx=idx, optimal_strategy=optimal_strategy)
-            if type_ == "CHANCE":
-                chance_node(idx=idx, optimal_strategy=optimal_strategy)
+        self._rollback_columns(prob=self._arrays.prob[:, np.newaxis], ev=ev, eu=eu)
 
-        dispatch(idx=0, optimal_strategy=True)
+        ceqs = eu.copy()
+        ceqs[:, risk_averse] = _eval_inv_utility_fn(
+            eu[:, risk_averse],
+            utility_fn,
+            risk_tolerance=risk_tolerances[np.newaxis, risk_averse],
+        )
+        return ceqs
 
-    def _compute_certainty_equivalents(
-        self, utility_fn: str, risk_tolerance: float
-    ) -> None:
-        for node in self._tree_nodes:
-            exputl = node.get("EU")
-            node["CE"] = _eval_inv_utility_fn(exputl, utility_fn, risk_tolerance)
+    def _rollback_probabilities(self, prob: np.ndarray) -> np.ndarray:
+        #
+        # Rollback of the tree for several sets of branch probabilities at
+        # once. `prob` has a row for each node and a column for each set.
+        # Returns the matrix of expected values of the nodes (rows) for each
+        # set (columns). The tree nodes are not modified.
+        #
+        # Only the predecessors of the nodes whose probabilities differ
+        # between the sets take different values in each set. The tree is
+        # rolled back once with the first set, and only these nodes are
+        # computed again for all the sets. The values of the terminal nodes
+        # are checked once, before both passes and the mask of the nodes to
+        # be computed again.
+        #
+        if self._is_evaluated is False:
+            raise ValueError(
+                "The tree must be evaluated before the rollback; call evaluate()"
+            )
+
+        first = prob[:, :1]
+        changed = ~np.all((prob == first) | (np.isnan(prob) & np.isnan(first)), axis=1)
+
+        ev = self._terminal_values(1)
+        self._rollback_columns(prob=first, ev=ev)
+        ev = np.repeat(ev, prob.shape[1], axis=1)
+        self._rollback_columns(
+            prob=prob, ev=ev, recompute=self._predecessors(np.flatnonzero(changed))
+        )
+        return ev
+
+    def _predecessors(self, nodes: np.ndarray) -> np.ndarray:
+        #
+        # Mask of the nodes with some of `nodes` in their subtree (excluding
+        # the nodes themselves), found one level up at a time
+        #
+        predecessor = self._arrays.predecessor
+        mask = np.zeros(len(predecessor), dtype=bool)
+        while len(nodes) > 0:
+            nodes = np.unique(predecessor[nodes])
+            nodes = nodes[nodes >= 0]
+            nodes = nodes[~mask[nodes]]
+            mask[nodes] = True
+        return mask
 
-    def _compute_path_probabilities(self) -> None:
+    def _compute_optimal_strategy(self) -> None:
+        #
+        # Top-down pass over the tree:
+        #
+        # * a node belongs to the optimal strategy when its predecessor
+        #   belongs to it and the branch is selected.
+        #
+        # * cum_prob[idx] is the probability of reaching the node `idx`
+        #   following the optimal strategy.
+        #
+        # The probability of the root and of the branches of decision nodes
+        # is 1
         #
-        def terminal_node(idx: int, cum_prob: float) -> None:
-            prob = self._tree_nodes[idx].get("tag_prob")
-            cum_prob = cum_prob if prob is None else cum_prob * prob
-            self._tree_nodes[idx]["PathProb"] = cum_prob
+        arrays = self._arrays
+        n_nodes = len(self._tree_nodes)
+        terminal_nodes = arrays.terminal_nodes.tolist()
+        prob = np.where(np.isnan(arrays.prob), 1.0, arrays.prob)
+        prob_list = prob.tolist()
+
+        if numba is not None:
+            optimal_strategy = np.zeros(n_nodes, dtype=bool)
+            optimal_strategy[0] = True
+            cum_prob = np.zeros(n_nodes)
+            cum_prob[0] = 1.0
+            _strategy_kernel(
+                arrays.type_,
+                prob,
+                arrays.succ_flat,
+                arrays.succ_ptr,
+                arrays.forced_successor,
+                arrays.optimal_successor,
+                optimal_strategy,
+                cum_prob,
+            )
+            strategy_list = optimal_strategy.tolist()
+            cum_prob_list = cum_prob.tolist()
+        else:
+            #
+            # Without numba the kernel is a plain Python loop over lists
+            #
+            type_list, succ_flat_list, succ_ptr_list, _ = self._skeleton_lists
+            strategy_list = [False] * n_nodes
+            strategy_list[0] = True
+            cum_prob_list = [0.0] * n_nodes
+            cum_prob_list[0] = 1.0
+            _strategy_kernel(
+                type_list,
+                prob_list,
+                succ_flat_list,
+                succ_ptr_list,
+                arrays.forced_successor.tolist(),
+                arrays.optimal_successor.tolist(),
+                strategy_list,
+                cum_prob_list,
+            )
 
-        def decision_node(idx: int, cum_prob: float) -> None:
-            successors = self._tree_nodes[idx].get("successors")
-            optimal_successor = self._tree_nodes[idx].get("optimal_successor")
-            prob = self._tree_nodes[idx].get("tag_prob")
-            prob = 1.0 if prob is None else prob
-            for successor in successors:
-                if successor == optimal_successor:
-                    dispatch(idx=successor, cum_prob=cum_prob * prob)
-                else:
-                    dispatch(idx=successor, cum_prob=0.0)
-
-        def chance_node(idx: int, cum_prob: float) -> None:
-            successors = self._tree_nodes[idx].get("successors")
-            forced_branch: int = self._tree_nodes[idx].get("forced_branch")
-            if forced_branch is None:
-                prob = self._tree_nodes[idx].get("tag_prob")
-                cum_prob = cum_prob if prob is None else cum_prob * prob
-                for successor in successors:
-                    dispatch(idx=successor, cum_prob=cum_prob)
-            else:
-                ## same behaviour of a selection node
-                for i_successor, successor in enumerate(successors):
-                    if i_successor == forced_branch:
-                        dispatch(idx=successor, cum_prob=cum_prob)
-                    else:
-                        dispatch(idx=successor, cum_prob=0.0)
+        path_probs = [cum_prob_list[idx] * prob_list[idx] for idx in terminal_nodes]
+        arrays.optimal_strategy[:] = strategy_list
+        arrays.path_prob[terminal_nodes] = path_probs
 
-        def dispatch(idx: int, cum_prob: float) -> None:
-            type_: str = self._tree_nodes[idx].get("type")
-            if type_ == "TERMINAL":
-                terminal_node(idx=idx, cum_prob=cum_prob)
-            if type_ == "DECISION":
-                decision_node(idx=idx, cum_prob=cum_prob)
-            if type_ == "CHANCE":
-                chance_node(idx=idx, cum_prob=cum_prob)
+        tree_nodes = self._tree_nodes
+        for node, strategy in zip(tree_nodes, strategy_list):
+            node["optimal_strategy"] = strategy
+        for idx, path_prob in zip(terminal_nodes, path_probs):
+            tree_nodes[idx]["PathProb"] = path_prob
 
-        dispatch(idx=0, cum_prob=1.0)
+    def _compute_certainty_equivalents(
+        self, utility_fn: str, risk_tolerance: float
+    ) -> None:
+        #
+        # The expected utilities of all nodes are in the array representation
+        # after the rollback, so the inverse utility is evaluated once
+        #
+        self._arrays.ce[:] = _eval_inv_utility_fn(
+            self._arrays.eu, utility_fn, risk_tolerance
+        )
+        for node, certainty_equivalent in zip(self._tree_nodes, self._arrays.ce):
+            node["CE"] = certainty_equivalent
 
     # -------------------------------------------------------------------------
     #
@@ -1057,266 +1994,212 @@ class DecisionTree:
 
         """
 
-        width = "0.25"
-        height = "0.1"
-        arrowsize = "0.3"
-        fontsize = "8.0"
+        #
+        # Plots are cached until the tree is modified
+        #
+        if self._plot_cache_version != self._version:
+            self._plot_cache = {}
+            self._plot_cache_version = self._version
+        key = (max_deep, policy_suggestion)
+        if key in self._plot_cache:
+            return self._plot_cache[key].copy()
+
+        nodes = self._tree_nodes
+        type_ = self._arrays.type_
+        optimal_strategy = self._arrays.optimal_strategy
+        if max_deep is None:
+            max_deep = float("inf")
 
-        def terminal(idx: int, main_dot, max_deep: int, deep: int):
+        #
+        # Expected values and path probabilities are formatted at once for
+        # all nodes; missing values are NaN and are not used
+        #
+        expval_labels = np.char.mod(
+            "%.2f", np.array([node.get("EV", np.nan) for node in nodes], dtype=float)
+        )
+        pathprobs = np.array([node.get("PathProb", np.nan) for node in nodes])
+        pathprob_labels = [
+            " 1.000%" if pathprob == 1.0 else " " + text[1:]
+            for pathprob, text in zip(pathprobs, np.char.mod("%.4f%%", pathprobs))
+        ]
 
-            name = self._tree_nodes[idx].get("name")
+        #
+        # Attribute lists of the DOT statements (sorted as graphviz does)
+        #
+        font = 'fontname="Courier New" fontsize=8.0'
+        terminal_attrs = (
+            f"color=powderblue {font} height=0.1 shape=box style=filled width=0.25"
+        )
+        chance_attrs = f"color=darkseagreen {font} height=0.05 shape=ellipse width=0.25"
+        chance_branch_attrs = (
+            f"color=darkseagreen {font} height=0.1 shape=box style=rounded"
+        )
+        decision_attrs = (
+            f"color=chocolate {font} height=0.05 shape=box style=rounded width=0.25"
+        )
+        decision_branch_attrs = (
+            f"color=chocolate {font} height=0.05 shape=box style=rounded"
+        )
+
+        def node_stmt(indent: str, name: str, label: str, attrs: str) -> str:
+            return f"{indent}{_quote_dot(name)} [label={_quote_dot(label)} {attrs}]\n"
+
+        #
+        # Branches in the optimal strategy are drawn with a wider pen; the
+        # edge attributes are looked up by the node id of the successor
+        #
+        edge_attrs = [
+            f"arrowsize=0.3 penwidth={_PENWIDTH[flag]}"
+            for flag in optimal_strategy.tolist()
+        ]
+
+        def edge_stmt(indent: str, tail: str, head: str, successor: int) -> str:
+            return (
+                f"{indent}{_quote_dot(tail)} -> {_quote_dot(head)} "
+                f"[{edge_attrs[successor]}]\n"
+            )
+
+        def branches(idx: int, sid: str, lines: list, attrs: str) -> list:
+            #
+            # Writes the branch boxes of a chance or decision node, with the
+            # edges from the node, and returns its successors
+            #
+            successors = self._children(idx)
+            for successor in successors:
+                tag_branch = nodes[successor].get("tag_branch")
+                branch = sid + tag_branch
+                lines.append(node_stmt("\t\t", branch, tag_branch, attrs))
+                lines.append(edge_stmt("\t\t", sid, branch, successor))
+            return successors
+
+        #
+        # Each node function writes the DOT statements of the node and its
+        # branches, and returns the successors to be drawn and their deep
+        #
+        def terminal(idx: int, lines: list, deep: int):
+
+            node = nodes[idx]
+            name = node.get("name")
             label = ""
-            if "EV" in self._tree_nodes[idx].keys():
-                expval = self._tree_nodes[idx].get("EV")
-                label += "{:.2f}".format(expval)
-            if "PathProb" in self._tree_nodes[idx].keys():
-                pathprob = self._tree_nodes[idx].get("PathProb")
-                if pathprob == np.float64(1.0):
-                    label += " 1.000%"
-                else:
-                    label += " " + "{:.4f}%".format(pathprob)[1:]
+            if "EV" in node:
+                label += expval_labels[idx]
+            if "PathProb" in node:
+                label += pathprob_labels[idx]
             if label == "":
                 label = name
 
-            dot = Digraph(name="cluster_" + str(idx))
-            dot.attr(rankdir="LR", color="white")
-            dot.node(
-                str(idx),
-                label,
-                shape="box",
-                height=height,
-                width=width,
-                style="filled",
-                color="powderblue",
-                fontsize=fontsize,
-                fontname="Courier New",
-            )
+            lines.append(f"\tsubgraph cluster_{idx} {{\n")
+            lines.append("\t\tcolor=white rankdir=LR\n")
+            lines.append(node_stmt("\t\t", str(idx), label, terminal_attrs))
+            lines.append("\t}\n")
+
+            return [], deep
 
-            main_dot.subgraph(dot)
+        def chance(idx: int, lines: list, deep: int):
 
-            ## return main_dot
+            node = nodes[idx]
+            sid = str(idx)
 
-        def chance(idx: int, main_dot, max_deep: int, deep: int):
+            label = node.get("name")
+            if "EV" in node:
+                label += r"\n" + expval_labels[idx]
 
             #
             # It's the maximum deep
             #
             deep += 1
-            if max_deep is not None and deep >= max_deep:
-
-                label = self._tree_nodes[idx].get("name")
-                if "EV" in self._tree_nodes[idx].keys():
-                    expval = self._tree_nodes[idx].get("EV")
-                    label += r"\n{:0.2f}".format(expval)
-
-                main_dot.node(
-                    str(idx),
-                    label=label,
-                    shape="ellipse",
-                    width=width,
-                    height="0.05",
-                    color="darkseagreen",
-                    fontsize=fontsize,
-                    fontname="Courier New",
-                )
-                return
+            if deep >= max_deep:
+                lines.append(node_stmt("\t", sid, label, chance_attrs))
+                return [], deep
 
             #
             # Draws the node and branches
             #
-            label = self._tree_nodes[idx].get("name")
-            dot = Digraph(name="cluster_" + str(idx))
-            dot.attr(rankdir="LR", style="rounded", color="darkseagreen")
-
-            if "EV" in self._tree_nodes[idx].keys():
-                expval = self._tree_nodes[idx].get("EV")
-                label += r"\n{:0.2f}".format(expval)
-
-            dot.node(
-                str(idx),
-                label=label,
-                shape="ellipse",
-                width=width,
-                height="0.05",
-                color="darkseagreen",
-                fontsize=fontsize,
-                fontname="Courier New",
-            )
+            lines.append(f"\tsubgraph cluster_{idx} {{\n")
+            lines.append("\t\tcolor=darkseagreen rankdir=LR style=rounded\n")
+            lines.append(node_stmt("\t\t", sid, label, chance_attrs))
 
-            successors = self._tree_nodes[idx].get("successors")
-            for successor in successors:
-                tag_branch = self._tree_nodes[successor].get("tag_branch")
-                dot.node(
-                    str(idx) + tag_branch,
-                    label=tag_branch,
-                    shape="box",
-                    height="0.1",
-                    style="rounded",
-                    color="darkseagreen",
-                    fontsize=fontsize,
-                    fontname="Courier New",
-                )
+            successors = branches(idx, sid, lines, chance_branch_attrs)
 
-                optimal_strategy = self._tree_nodes[successor].get("optimal_strategy")
+            lines.append("\t}\n")
 
-                penwidth = "2" if optimal_strategy is True else "1"
+            return successors, deep
 
-                dot.edge(
-                    str(idx),
-                    str(idx) + tag_branch,
-                    arrowsize=arrowsize,
-                    penwidth=penwidth,
-                )
-
-            main_dot.subgraph(dot)
+        def decision(idx: int, lines: list, deep: int):
 
             #
-            # Draw successors
+            # At the maximum deep the node is only drawn by the connection
+            # from its predecessor
             #
-            if max_deep is None or (max_deep is not None and deep < max_deep):
-
-                for successor in successors:
-                    dispatch(
-                        idx=successor, main_dot=main_dot, max_deep=max_deep, deep=deep
-                    )
-
-                    tag_branch = self._tree_nodes[successor].get("tag_branch")
-
-                    optimal_strategy = self._tree_nodes[successor].get(
-                        "optimal_strategy"
-                    )
-
-                    penwidth = "2" if optimal_strategy is True else "1"
+            if deep >= max_deep:
+                return [], deep
 
-                    main_dot.edge(
-                        str(idx) + tag_branch,
-                        str(successor),
-                        arrowsize=arrowsize,
-                        penwidth=penwidth,
-                    )
+            node = nodes[idx]
+            sid = str(idx)
+            label = node.get("name")
+            if "EV" in node:
+                label += r"\n" + expval_labels[idx]
 
-            ## return main_dot
-
-        def decision(idx: int, main_dot, max_deep: int, deep: int):
-
-            name = self._tree_nodes[idx].get("name")
-
-            label = name
-            if "EV" in self._tree_nodes[idx].keys():
-                expval = self._tree_nodes[idx].get("EV")
-                label += r"\n{:0.2f}".format(expval)
-
-            dot = Digraph(name="cluster_" + str(idx))
-            dot.attr(rankdir="LR", style="rounded", color="peru")
-            dot.node(
-                str(idx),
-                label=label,
-                shape="box",
-                width=width,
-                height="0.05",
-                style="rounded",
-                color="chocolate",
-                fontsize=fontsize,
-                fontname="Courier New",
-            )
+            lines.append(f"\tsubgraph cluster_{idx} {{\n")
+            lines.append("\t\tcolor=peru rankdir=LR style=rounded\n")
+            lines.append(node_stmt("\t\t", sid, label, decision_attrs))
 
-            if max_deep is None or (max_deep is not None and deep < max_deep):
-
-                successors = self._tree_nodes[idx].get("successors")
-
-                #
-                # Draws the branch
-                #
-                for successor in successors:
-
-                    tag_branch = self._tree_nodes[successor].get("tag_branch")
-
-                    dot.node(
-                        str(idx) + tag_branch,
-                        label=tag_branch,
-                        shape="box",
-                        style="rounded",
-                        height="0.05",
-                        color="chocolate",
-                        fontsize=fontsize,
-                        fontname="Courier New",
-                    )
-
-                    optimal_strategy = self._tree_nodes[successor].get(
-                        "optimal_strategy"
-                    )
-
-                    penwidth = "2" if optimal_strategy is True else "1"
-
-                    dot.edge(
-                        str(idx),
-                        str(idx) + tag_branch,
-                        arrowsize=arrowsize,
-                        penwidth=penwidth,
-                    )
-
-                main_dot.subgraph(dot)
-
-                #
-                # Draws successors
-                #
-                for successor in successors:
-
-                    if "optimal_strategy" in self._tree_nodes[successor].keys():
-                        optimal_strategy = self._tree_nodes[successor][
-                            "optimal_strategy"
-                        ]
-                    else:
-                        optimal_strategy = False
+            #
+            # Draws the branch
+            #
+            successors = branches(idx, sid, lines, decision_branch_attrs)
 
-                    if policy_suggestion is True and optimal_strategy is False:
-                        continue
+            lines.append("\t}\n")
 
-                    dispatch(
-                        idx=successor, main_dot=main_dot, max_deep=max_deep, deep=deep
-                    )
+            return successors, deep
 
-                    #
-                    # Connection
-                    #
-                    tag_branch = self._tree_nodes[successor].get("tag_branch")
+        def connection(idx: int, successor: int, lines: list):
 
-                    optimal_strategy = self._tree_nodes[successor].get(
-                        "optimal_strategy"
-                    )
-
-                    penwidth = "2" if optimal_strategy is True else "1"
+            tag_branch = nodes[successor].get("tag_branch")
+            lines.append(
+                edge_stmt("\t", str(idx) + tag_branch, str(successor), successor)
+            )
 
-                    main_dot.edge(
-                        str(idx) + tag_branch,
-                        str(successor),
-                        arrowsize=arrowsize,
-                        penwidth=penwidth,
-                    )
+        #
+        # Node functions indexed by the type code of the node:
+        # TERMINAL (0), DECISION (1) and CHANCE (2)
+        #
+        handlers = (terminal, decision, chance)
 
-        def dispatch(idx: int, main_dot, max_deep: int, deep: int):
+        lines = ["\trankdir=LR\n"]
 
-            type_ = self._tree_nodes[idx].get("type")
+        #
+        # Depth-first traversal with an explicit stack. The connection from
+        # a branch to its successor is drawn after the subtree of the
+        # successor, as in the recursive version
+        #
+        stack: list = [(0, None, 0)]
+        while stack:
+            idx, predecessor, deep = stack.pop()
 
-            if type_ == "TERMINAL":
-                ## main_dot = terminal(idx, main_dot, max_deep, deep)
-                terminal(idx, main_dot, max_deep, deep)
+            if predecessor is not None:
+                connection(idx=predecessor, successor=idx, lines=lines)
+                continue
 
-            if type_ == "DECISION":
-                ## main_dot = decision(idx, main_dot, max_deep, deep)
-                decision(idx, main_dot, max_deep, deep)
+            successors, deep = handlers[type_[idx]](idx=idx, lines=lines, deep=deep)
 
-            if type_ == "CHANCE":
-                ## main_dot = chance(idx, main_dot, max_deep, deep)
-                chance(idx, main_dot, max_deep, deep)
+            #
+            # The optimal strategy flags computed in the rollback are the
+            # policy mask: branches of decision nodes outside the optimal
+            # strategy are pruned before they are pushed
+            #
+            if policy_suggestion is True and type_[idx] == DECISION:
+                successors = [
+                    successor for successor in successors if optimal_strategy[successor]
+                ]
 
-            ## return main_dot
+            for successor in reversed(successors):
+                stack.append((successor, idx, deep))
+                stack.append((successor, None, deep))
 
-        dot = Digraph()
-        dot.attr(rankdir="LR")  # splines="compound"
-        dispatch(idx=0, main_dot=dot, max_deep=max_deep, deep=0)
-        ## dot = dispatch(idx=0, main_dot=dot, max_deep=max_deep, deep=0)
-        return dot
+        dot = Digraph(body=lines)
+        self._plot_cache[key] = dot
+        return dot.copy()
 
 
 if __name__ == "__main__":
@@ -28,11 +28,9 @@ def stguide():
 
     def payoff_fn(**kwargs):
         values = kwargs["values"]
-        bid = values["bid"] if "bid" in values.keys() else 0
-        competitor_bid = (
-            values["competitor_bid"] if "competitor_bid" in values.keys() else 0
-        )
-        cost = values["cost"] if "cost" in values.keys() else 0
+        bid = values["bid"] if "bid" in values else 0
+        competitor_bid = values["competitor_bid"] if "competitor_bid" in values else 0
+        cost = values["cost"] if "cost" in values else 0
         return (bid - cost) * (1 if bid < competitor_bid else 0)
 
     nodes = DataNodes()
@@ -77,11 +75,9 @@ def stguide_dependent_probabilities():
 
     def payoff_fn(**kwargs):
         values = kwargs["values"]
-        bid = values["bid"] if "bid" in values.keys() else 0
-        competitor_bid = (
-            values["competitor_bid"] if "competitor_bid" in values.keys() else 0
-        )
-        cost = values["cost"] if "cost" in values.keys() else 0
+        bid = values["bid"] if "bid" in values else 0
+        competitor_bid = values["competitor_bid"] if "competitor_bid" in values else 0
+        cost = values["cost"] if "cost" in values else 0
         return (bid - cost) * (1 if bid < competitor_bid else 0)
 
     nodes = DataNodes()
@@ -137,11 +133,9 @@ def stguide_dependent_outcomes():
 
     def payoff_fn(**kwargs):
         values = kwargs["values"]
-        bid = values["bid"] if "bid" in values.keys() else 0
-        competitor_bid = (
-            values["competitor_bid"] if "competitor_bid" in values.keys() else 0
-        )
-        cost = values["cost"] if "cost" in values.keys() else 0
+        bid = values["bid"] if "bid" in values else 0
+        competitor_bid = values["competitor_bid"] if "competitor_bid" in values else 0
+        cost = values["cost"] if "cost" in values else 0
         return (bid - cost) * (1 if bid < competitor_bid else 0)
 
     nodes = DataNodes()
@@ -216,11 +210,9 @@ def stbook():
 
     def payoff_fn(**kwargs):
         values = kwargs["values"]
-        bid = values["bid"] if "bid" in values.keys() else 0
-        competitor_bid = (
-            values["competitor_bid"] if "competitor_bid" in values.keys() else 0
-        )
-        cost = values["cost"] if "cost" in values.keys() else 0
+        bid = values["bid"] if "bid" in values else 0
+        competitor_bid = values["competitor_bid"] if "competitor_bid" in values else 0
+        cost = values["cost"] if "cost" in values else 0
         return (bid - cost) * (1 if bid < competitor_bid else 0)
 
     nodes = DataNodes()
@@ -266,11 +258,9 @@ def stbook_dependent_outcomes():
 
     def payoff_fn(**kwargs):
         values = kwargs["values"]
-        bid = values["bid"] if "bid" in values.keys() else 0
-        competitor_bid = (
-            values["competitor_bid"] if "competitor_bid" in values.keys() else 0
-        )
-        cost = values["cost"] if "cost" in values.keys() else 0
+        bid = values["bid"] if "bid" in values else 0
+        competitor_bid = values["competitor_bid"] if "competitor_bid" in values else 0
+        cost = values["cost"] if "cost" in values else 0
         return (bid - cost) * (1 if bid < competitor_bid else 0)
 
     nodes = DataNodes()
@@ -331,7 +321,7 @@ def oil_tree_example():
         values = kwargs["values"]
         test_decision = values["test_decision"]
         drill_decision = values["drill_decision"]
-        oil_found = values["oil_found"] if "oil_found" in values.keys() else 0
+        oil_found = values["oil_found"] if "oil_found" in values else 0
         return oil_found - drill_decision - test_decision
 
     nodes = DataNodes()
@@ -0,0 +1,16 @@
+"""
+Plotting Helpers
+===============================================================================
+
+Common formatting of the axes used by the plots of the package. Matplotlib is
+only imported when a plot is requested.
+
+"""
+
+
+def _style_axes(ax) -> None:
+    #
+    # Hides the frame of the axes
+    #
+    for spine in ("top", "right", "bottom", "left"):
+        ax.spines[spine].set_visible(False)
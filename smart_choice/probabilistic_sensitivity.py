@@ -5,12 +5,12 @@ Probabilistic Sensitivity Analysis
 
 """
 from typing import Any
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 
 from .decisiontree import DecisionTree
+from .plotting import _style_axes
 
 
 LINEFMTS = [
@@ -74,37 +74,43 @@ class ProbabilisticSensitivity:
             self._bottom_branch,
         ) = self._decisiontree._data_nodes.get_top_bottom_branches(self._varname)
 
+        #
+        # Tree nodes affected by the changes in the probabilities. They are
+        # located once, and only these nodes are modified in each iteration.
+        #
+        by_tag = self._decisiontree._by_tag
+        self._top_nodes = by_tag.get((self._varname, self._top_branch), [])
+        self._bottom_nodes = by_tag.get((self._varname, self._bottom_branch), [])
+
     def _set_branch_probabilities_to_zero(self):
-        for i_node, node in enumerate(self._decisiontree._tree_nodes):
-            tag_name = node.get("tag_name")
+        tree_nodes = self._decisiontree._tree_nodes
+        for (tag_name, _), nodes in self._decisiontree._by_tag.items():
             if tag_name == self._varname:
-                self._decisiontree._tree_nodes[i_node]["tag_prob"] = 0
+                for i_node in nodes:
+                    tree_nodes[i_node]["tag_prob"] = 0
 
-    def _set_branch_probabilities(self, top_probability):
-
-        for i_node, node in enumerate(self._decisiontree._tree_nodes):
-            tag_name = node.get("tag_name")
-            if tag_name == self._varname:
-                tag_branch = node.get("tag_branch")
-                if tag_branch == self._top_branch:
-                    self._decisiontree._tree_nodes[i_node]["tag_prob"] = (
-                        1 - top_probability
-                    )
-                if tag_branch == self._bottom_branch:
-                    self._decisiontree._tree_nodes[i_node]["tag_prob"] = top_probability
+    def _sweep_expected_values(self):
+        #
+        # Expected values of the tree nodes (rows) for each probability of
+        # the top branch (columns), computed in a single rollback
+        #
+        self._decisiontree._load_probabilities()
+        prob = np.repeat(
+            self._decisiontree._arrays.prob[:, np.newaxis],
+            len(self.probabilities_),
+            axis=1,
+        )
+        probabilities = np.array(self.probabilities_)
+        prob[self._top_nodes, :] = 1 - probabilities
+        prob[self._bottom_nodes, :] = probabilities
+        return self._decisiontree._rollback_probabilities(prob)
 
     def probabilistic_sensitivity_chance(self) -> None:
 
         self._get_top_bottom_branches()
         self._set_branch_probabilities_to_zero()
         self.probabilities_ = np.linspace(start=0, stop=1, num=21).tolist()
-        self.expected_values_ = []
-
-        for top_probability in self.probabilities_:
-            self._set_branch_probabilities(top_probability)
-            self._decisiontree.rollback()
-            expval = self._decisiontree._tree_nodes[self._idx].get("EV")
-            self.expected_values_.append(expval)
+        self.expected_values_ = self._sweep_expected_values()[self._idx, :].tolist()
 
         self.df_ = pd.DataFrame(
             {
@@ -118,44 +124,40 @@ class ProbabilisticSensitivity:
         self._get_top_bottom_branches()
         self._set_branch_probabilities_to_zero()
 
-        successors = self._decisiontree._tree_nodes[self._idx].get("successors")
+        successors = self._decisiontree._children(self._idx)
         tag_branches = [
             self._decisiontree._tree_nodes[successor].get("tag_branch")
             for successor in successors
         ]
 
+        self.probabilities_ = np.linspace(start=0, stop=1, num=21).tolist()
+        expvals = self._sweep_expected_values()
+
         self.expected_values_ = {}
-        for tag_branch in tag_branches:
-            self.expected_values_[tag_branch] = []
+        for successor, tag_branch in zip(successors, tag_branches):
+            self.expected_values_[tag_branch] = expvals[successor, :].tolist()
 
-        self.probabilities_ = np.linspace(start=0, stop=1, num=21).tolist()
-        for top_probability in self.probabilities_:
-
-            self._set_branch_probabilities(top_probability)
-            self._decisiontree.rollback()
-
-            expvals = [
-                self._decisiontree._tree_nodes[successor].get("EV")
-                for successor in successors
-            ]
-            for expval, tag_branch in zip(expvals, tag_branches):
-                self.expected_values_[tag_branch].append(expval)
-
-        self.df_ = pd.concat(
-            [
-                pd.DataFrame(
-                    {
-                        "Branch": [str(tag_branch)] * len(self.probabilities_),
-                        "Probability": self.probabilities_,
-                        "Value": self.expected_values_[tag_branch],
-                    }
-                )
-                for tag_branch in self.expected_values_.keys()
-            ]
+        #
+        # Results of all branches stacked in a single frame. The index
+        # restarts for each branch
+        #
+        n_probabilities = len(self.probabilities_)
+        n_branches = len(tag_branches)
+        self.df_ = pd.DataFrame(
+            {
+                "Branch": np.repeat(
+                    np.array([str(tag_branch) for tag_branch in tag_branches]),
+                    n_probabilities,
+                ),
+                "Probability": np.tile(self.probabilities_, n_branches),
+                "Value": expvals[successors, :].ravel(),
+            },
+            index=np.tile(np.arange(n_probabilities), n_branches),
         )
 
     def plot(self):
         """Plots the sensitivty to probability."""
+        import matplotlib.pyplot as plt
 
         if isinstance(self.expected_values_, dict):
             for fmt, tag_branch in zip(LINEFMTS, self.expected_values_.keys()):
@@ -168,11 +170,9 @@ class ProbabilisticSensitivity:
         else:
             plt.gca().plot(self.probabilities_, self.expected_values_, "-k")
 
-        plt.gca().spines["bottom"].set_visible(False)
-        plt.gca().spines["left"].set_visible(False)
-        plt.gca().spines["right"].set_visible(False)
-        plt.gca().spines["top"].set_visible(False)
-        plt.gca().set_ylabel("Expected values")
-        plt.gca().set_xlabel("Probability")
+        ax = plt.gca()
+        _style_axes(ax)
+        ax.set_ylabel("Expected values")
+        ax.set_xlabel("Probability")
         plt.legend()
         plt.grid()
@@ -6,12 +6,11 @@ Risk Profile Analysis
 
 """
 
-
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 from .decisiontree import DecisionTree
+from .plotting import _style_axes
 
 LINEFMTS = [
     "-k",
@@ -64,14 +63,13 @@ class RiskProfile:
         cumulative: bool = False,
         single: bool = True,
     ):
-        self._decisiontree = decisiontree.copy()
+        self._decisiontree = decisiontree
         self._idx = idx
         self._cumulative = cumulative
         self._single = single
 
         self.df_ = {}
 
-        self._rollback_risk_profiles()
         self._compute_risk_profiles()
 
     def __repr__(self):
@@ -92,68 +90,21 @@ class RiskProfile:
     # Computation
     #
     #
-    def _rollback_risk_profiles(self) -> None:
-        #
-        def terminal(idx: int) -> None:
-            value: float = self._decisiontree._tree_nodes[idx].get("EV")
-            self._decisiontree._tree_nodes[idx]["RiskProfile"] = {value: 1.0}
-
-        def chance(idx: int) -> None:
-            successors = self._decisiontree._tree_nodes[idx].get("successors")
-            for successor in successors:
-                dispatch(idx=successor)
-            self._decisiontree._tree_nodes[idx]["RiskProfile"] = {}
-            for successor in successors:
-                prob = self._decisiontree._tree_nodes[successor].get("tag_prob")
-
-                for value_successor, prob_successor in self._decisiontree._tree_nodes[
-                    successor
-                ]["RiskProfile"].items():
-                    if (
-                        value_successor
-                        in self._decisiontree._tree_nodes[idx]["RiskProfile"].keys()
-                    ):
-                        self._decisiontree._tree_nodes[idx]["RiskProfile"][
-                            value_successor
-                        ] += (prob * prob_successor)
-                    else:
-                        self._decisiontree._tree_nodes[idx]["RiskProfile"][
-                            value_successor
-                        ] = (prob * prob_successor)
-
-        def decision(idx: int) -> None:
-            successors = self._decisiontree._tree_nodes[idx].get("successors")
-            for successor in successors:
-                dispatch(idx=successor)
-            optimal_successor = self._decisiontree._tree_nodes[idx].get(
-                "optimal_successor"
-            )
-            self._decisiontree._tree_nodes[idx][
-                "RiskProfile"
-            ] = self._decisiontree._tree_nodes[optimal_successor]["RiskProfile"]
-
-        def dispatch(idx: int) -> None:
-            type_ = self._decisiontree._tree_nodes[idx].get("type")
-            if type_ == "TERMINAL":
-                terminal(idx=idx)
-            if type_ == "CHANCE":
-                chance(idx=idx)
-            if type_ == "DECISION":
-                decision(idx=idx)
-
-        dispatch(idx=self._idx)
-
     def _compute_risk_profiles(self) -> None:
         #
         def compute(idx: int):
 
-            risk_profile = self._decisiontree._tree_nodes[idx].get("RiskProfile").copy()
-            values = sorted(risk_profile.keys())
-            probs = [risk_profile[value] for value in values]
-            cumprobs = np.cumsum(probs).tolist()
-
-            expval = self._decisiontree._tree_nodes[idx].get("EV")
-            tag_branch = self._decisiontree._tree_nodes[idx].get("tag_branch")
+            #
+            # The profile arrays are shared with the cache of the tree (and
+            # between a decision node and its optimal successor); they are
+            # only read here, and the data frame holds its own copy
+            #
+            values, probs = self._decisiontree._risk_profile(idx)
+            cumprobs = np.cumsum(probs)
+
+            node = self._decisiontree._tree_nodes[idx]
+            expval = node.get("EV")
+            tag_branch = node.get("tag_branch")
             if tag_branch is not None:
                 label = "{}; EV={:.2f}".format(tag_branch, expval)
             else:
@@ -174,7 +125,7 @@ class RiskProfile:
             self.df_[label] = df_
 
         def multiple(idx):
-            successors = self._decisiontree._tree_nodes[idx].get("successors")
+            successors = self._decisiontree._children(idx)
             for successor in successors:
                 label, df_ = compute(idx=successor)
                 self.df_[label] = df_
@@ -191,24 +142,23 @@ class RiskProfile:
     #
     def plot(self):
         """Risk profile plot."""
+        import matplotlib.pyplot as plt
+
         #
         def format_plot():
-            plt.gca().spines["bottom"].set_visible(False)
-            plt.gca().spines["left"].set_visible(False)
-            plt.gca().spines["right"].set_visible(False)
-            plt.gca().spines["top"].set_visible(False)
-
-            plt.gca().set_xlabel("Expected values")
-            plt.gca().set_ylabel("Probability")
-            plt.gca().legend()
+            ax = plt.gca()
+            _style_axes(ax)
+            ax.set_xlabel("Expected values")
+            ax.set_ylabel("Probability")
+            ax.legend()
             plt.grid()
 
         def stem_plot():
 
             for i_key, key in enumerate(self.df_.keys()):
                 df_ = self.df_[key]
-                x_points = df_["Value"]
-                y_points = df_["Probability"]
+                x_points = df_["Value"].to_numpy()
+                y_points = df_["Probability"].to_numpy()
                 markerline, _, _ = plt.gca().stem(
                     x_points,
                     y_points,
@@ -225,9 +175,11 @@ class RiskProfile:
 
             for i_key, key in enumerate(self.df_.keys()):
                 df_ = self.df_[key]
-                x_points = df_["Value"].tolist()
-                x_points += [x_points[-1]]
-                y_points = [0] + df_["Cumulative Probability"].tolist()
+                x_points = df_["Value"].to_numpy()
+                x_points = np.concatenate([x_points, x_points[-1:]])
+                y_points = np.concatenate(
+                    [[0.0], df_["Cumulative Probability"].to_numpy()]
+                )
                 plt.gca().step(
                     x_points, y_points, LINEFMTS[i_key], label=key, alpha=0.8
                 )
@@ -4,12 +4,15 @@ Risk Sensitivity Analysis
 
 """
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 
 from .decisiontree import DecisionTree
+from .plotting import _style_axes
+
+COLORS = ["k"] * 4 + ["r"] * 4 + ["g"] * 4
+LINESTYLES = ["solid", "dashed", "dashdot", "dotted"] * 3
 
 
 class RiskAttitudeSensitivity:
@@ -43,7 +46,7 @@ class RiskAttitudeSensitivity:
         self._idx = idx
 
         # computation
-        self.type_ = decisiontree._tree_nodes[0].get("type")
+        self.type_ = decisiontree._tree_nodes[idx].get("type")
         if self.type_ == "DECISION":
             self._risk_attitude_decision()
         if self.type_ == "CHANCE":
@@ -56,7 +59,7 @@ class RiskAttitudeSensitivity:
 
     def _prepare(self):
 
-        successors = self._decisiontree._tree_nodes[0].get("successors")
+        successors = self._decisiontree._children(self._idx)
 
         self.branch_names_ = [
             self._decisiontree._tree_nodes[successor].get("tag_branch")
@@ -67,80 +70,66 @@ class RiskAttitudeSensitivity:
             start=0, stop=1.0 / self._risk_tolerance, num=11
         ).tolist()
 
+        #
+        # Risk tolerances and their labels are computed once for the sweep;
+        # a zero risk aversion is an infinite risk tolerance (risk neutral)
+        #
+        risk_aversions = np.asarray(self.risk_aversions_, dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            self._risk_tolerances = np.where(
+                risk_aversions == 0.0, np.inf, 1.0 / risk_aversions
+            )
+
         self.risk_tolerance_ = [
-            "Infinity"
-            if risk_aversion == np.float(0)
-            else int(round(1 / risk_aversion, 0))
-            for risk_aversion in self.risk_aversions_
+            "Infinity" if np.isinf(risk_tolerance) else int(round(risk_tolerance, 0))
+            for risk_tolerance in self._risk_tolerances
         ]
 
+    def _sweep_certainty_equivalents(self):
+        #
+        # Certainty equivalents of the tree nodes (rows) for each risk
+        # aversion (columns), computed in a single rollback.
+        #
+        self._decisiontree.evaluate()
+        return self._decisiontree._rollback_certainty_equivalents(
+            utility_fn=self._utility_fn, risk_tolerances=self._risk_tolerances
+        )
+
     def _risk_attitude_decision(self):
 
         self._prepare()
 
+        successors = self._decisiontree._children(self._idx)
+        ceqs = self._sweep_certainty_equivalents()[successors, :]
+
         self.certainty_equivalents_ = {}
-        for tag_branch in self.branch_names_:
-            self.certainty_equivalents_[tag_branch] = []
-
-        successors = self._decisiontree._tree_nodes[self._idx].get("successors")
-        for risk_aversion in self.risk_aversions_:
-
-            if risk_aversion == np.float64(0):
-                self._decisiontree.evaluate()
-                self._decisiontree.rollback()
-                ceqs = [
-                    self._decisiontree._tree_nodes[successor].get("EV")
-                    for successor in successors
-                ]
-            else:
-                self._decisiontree.rollback(
-                    utility_fn=self._utility_fn, risk_tolerance=1.0 / risk_aversion
-                )
-                ceqs = [
-                    self._decisiontree._tree_nodes[successor].get("CE")
-                    for successor in successors
-                ]
-
-            for ceq, tag_branch in zip(ceqs, self.branch_names_):
-                self.certainty_equivalents_[tag_branch].append(ceq)
-
-        results = self.certainty_equivalents_.copy()
-        results["Risk Tolerance"] = self.risk_tolerance_
-        self.df_ = pd.DataFrame(results)
+        for i_branch, tag_branch in enumerate(self.branch_names_):
+            self.certainty_equivalents_[tag_branch] = ceqs[i_branch, :].tolist()
 
-    def _risk_attitude_chance(self):
+        self.df_ = pd.DataFrame(ceqs.T, columns=self.branch_names_)
+        self.df_["Risk Tolerance"] = self.risk_tolerance_
 
-        self.certainty_equivalents_ = []
+    def _risk_attitude_chance(self):
 
-        for risk_aversion in self.risk_aversions_:
+        self._prepare()
 
-            if risk_aversion == np.float64(0):
-                self._decisiontree.evaluate()
-                self._decisiontree.rollback()
-                ceq = self._decisiontree._tree_nodes[0].get("EV")
-            else:
-                self._decisiontree.evaluate()
-                self._decisiontree.rollback(
-                    utility_fn=self._utility_fn, risk_tolerance=1.0 / risk_aversion
-                )
-                ceq = self._decisiontree._tree_nodes[self._idx].get("CE")
-            self.certainty_equivalents_.append(ceq)
+        ceqs = self._sweep_certainty_equivalents()
+        self.certainty_equivalents_ = ceqs[self._idx, :].tolist()
 
-        name = self._decisiontree._tree_nodes[self._idx].name
-        results = {name: self.certainty_equivalents_}
-        results["Risk Tolerance"] = self.risk_tolerance_
-        self.df_ = pd.DataFrame(results)
+        name = self._decisiontree._tree_nodes[self._idx].get("name")
+        self.df_ = pd.DataFrame({name: self.certainty_equivalents_})
+        self.df_["Risk Tolerance"] = self.risk_tolerance_
 
     def _format_plot(self):
+        import matplotlib.pyplot as plt
+
         plt.xticks(self.risk_aversions_, self.risk_tolerance_)
-        plt.gca().spines["bottom"].set_visible(False)
-        plt.gca().spines["left"].set_visible(False)
-        plt.gca().spines["right"].set_visible(False)
-        plt.gca().spines["top"].set_visible(False)
-        plt.gca().set_ylabel("Expected values")
-        plt.gca().set_xlabel("Risk tolerance")
-        # plt.gca().invert_xaxis()
-        plt.gca().legend()
+        ax = plt.gca()
+        _style_axes(ax)
+        ax.set_ylabel("Expected values")
+        ax.set_xlabel("Risk tolerance")
+        # ax.invert_xaxis()
+        ax.legend(handles=self._legend_handles)
         plt.grid()
 
     #
@@ -150,6 +139,7 @@ class RiskAttitudeSensitivity:
     def plot(self):
         """Plots the sensibility to risk attitude."""
 
+        self._legend_handles = None
         if self.type_ == "DECISION":
             self._plot_decision()
         if self.type_ == "CHANCE":
@@ -157,34 +147,41 @@ class RiskAttitudeSensitivity:
         self._format_plot()
 
     def _plot_chance(self):
+        import matplotlib.pyplot as plt
 
-        for tag_branch in self.branch_names_:
-            plt.gca().plot(
-                self.risk_aversions_,
-                self.certainty_equivalents_[tag_branch],
-                label=tag_branch,
-            )
+        plt.gca().plot(
+            self.risk_aversions_,
+            self.certainty_equivalents_,
+            label=self._decisiontree._tree_nodes[self._idx].get("name"),
+        )
 
     def _plot_decision(self):
-
-        linefmts = [
-            "-k",
-            "--k",
-            ".-k",
-            ":k",
-            "-r",
-            "--r",
-            ".-r",
-            ":r",
-            "-g",
-            "--g",
-            ".-g",
-            ":g",
-        ]
-        for linefmt, tag_branch in zip(linefmts, self.branch_names_):
-            plt.gca().plot(
-                self.risk_aversions_,
-                self.certainty_equivalents_[tag_branch],
-                linefmt,
-                label=tag_branch,
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
+        from matplotlib.lines import Line2D
+
+        #
+        # All branch curves are drawn as a single line collection; the
+        # legend uses proxy lines with the same color and style
+        #
+        n_branches = len(self.branch_names_)
+        segments = np.empty((n_branches, len(self.risk_aversions_), 2))
+        segments[:, :, 0] = self.risk_aversions_
+        for i_branch, tag_branch in enumerate(self.branch_names_):
+            segments[i_branch, :, 1] = self.certainty_equivalents_[tag_branch]
+
+        lines = LineCollection(
+            segments,
+            colors=COLORS[:n_branches],
+            linestyles=LINESTYLES[:n_branches],
+        )
+        ax = plt.gca()
+        ax.add_collection(lines)
+        ax.autoscale()
+
+        self._legend_handles = [
+            Line2D([], [], color=color, linestyle=linestyle, label=tag_branch)
+            for color, linestyle, tag_branch in zip(
+                COLORS, LINESTYLES, self.branch_names_
             )
+        ]
@@ -5,11 +5,12 @@ Spyder Graph
 
 """
 
-import matplotlib.pyplot as plt
 from operator import itemgetter
 
 from numpy import exp
 
+from .plotting import _style_axes
+
 LINEFMTS = [
     "-k",
     "--k",
@@ -37,6 +38,7 @@ def spider_graph(sensitivities: dict):
         dictionary contains ValueSensitivity results for individual values in the tree.
 
     """
+    import matplotlib.pyplot as plt
 
     for i_key, key in enumerate(sensitivities.keys()):
         values = sensitivities[key].branch_values_
@@ -45,12 +47,10 @@ def spider_graph(sensitivities: dict):
         expected_values = sensitivities[key].expected_values_
         plt.gca().plot(values, expected_values, LINEFMTS[i_key], label=key)
 
-    plt.gca().spines["bottom"].set_visible(False)
-    plt.gca().spines["left"].set_visible(False)
-    plt.gca().spines["right"].set_visible(False)
-    plt.gca().spines["top"].set_visible(False)
-    plt.gca().set_ylabel("Expected values")
-    plt.gca().set_xlabel("Change in input (%)")
-    plt.gca().legend()
+    ax = plt.gca()
+    _style_axes(ax)
+    ax.set_ylabel("Expected values")
+    ax.set_xlabel("Change in input (%)")
+    ax.legend()
 
     plt.grid()
@@ -5,9 +5,10 @@ Tornado Graph
 
 """
 
-import matplotlib.pyplot as plt
 from operator import itemgetter
 
+from .plotting import _style_axes
+
 
 def tornado_graph(sensitivities: dict):
     """Creates a tornado graph of value sensitivities for the analyzed tree.
@@ -16,6 +17,8 @@ def tornado_graph(sensitivities: dict):
         dictionary contains ValueSensitivity results for individual values in the tree.
 
     """
+    import matplotlib.pyplot as plt
+
     data = [
         (
             key,
@@ -36,11 +39,9 @@ def tornado_graph(sensitivities: dict):
 
     plt.gca().barh(y=seq, width=width, left=left, color="gray", alpha=0.8)
 
-    plt.gca().spines["bottom"].set_visible(False)
-    plt.gca().spines["left"].set_visible(False)
-    plt.gca().spines["right"].set_visible(False)
-    plt.gca().spines["top"].set_visible(False)
-    plt.gca().set_xlabel("Expected values")
+    ax = plt.gca()
+    _style_axes(ax)
+    ax.set_xlabel("Expected values")
 
     plt.yticks(seq, names)
 
@@ -6,11 +6,11 @@ Value Sensitivity Analysis
 
 from typing import Any
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 from .decisiontree import DecisionTree
+from .plotting import _style_axes
 
 LINEFMTS = [
     "-k",
@@ -75,6 +75,13 @@ class ValueSensitivity:
         self._idx = idx
         self._n_points = n_points
 
+        #
+        # Tree nodes of the analyzed branch
+        #
+        self._branch_nodes = self._decisiontree._by_tag.get(
+            (self._varname, self._branch_name), []
+        )
+
         if self._single is True:
             self._compute_sensitivity_single()
         else:
@@ -95,19 +102,15 @@ class ValueSensitivity:
 
     def _get_base_value(self) -> None:
 
-        for i_node, node in enumerate(self._decisiontree._tree_nodes):
-            tag_name = node.get("tag_name")
-            tag_branch = node.get("tag_branch")
-            if tag_name == self._varname and tag_branch == self._branch_name:
-                self._base_value = self._decisiontree._tree_nodes[i_node]["tag_value"]
+        tree_nodes = self._decisiontree._tree_nodes
+        for i_node in self._branch_nodes:
+            self._base_value = tree_nodes[i_node]["tag_value"]
 
     def _set_branch_value(self, value):
-
-        for i_node, node in enumerate(self._decisiontree._tree_nodes):
-            tag_name = node.get("tag_name")
-            tag_branch = node.get("tag_branch")
-            if tag_name == self._varname and tag_branch == self._branch_name:
-                self._decisiontree._tree_nodes[i_node]["tag_value"] = value
+        #
+        # Only the terminal nodes below the branch are evaluated again
+        #
+        self._decisiontree._set_tag_values(self._branch_nodes, value)
 
     def _compute_sensitivity_single(self):
 
@@ -121,7 +124,6 @@ class ValueSensitivity:
         self.expected_values_ = []
         for branch_value in self.branch_values_:
             self._set_branch_value(branch_value)
-            self._decisiontree.evaluate()
             self._decisiontree.rollback()
             expval = self._decisiontree._tree_nodes[self._idx].get("EV")
             self.expected_values_.append(expval)
@@ -141,7 +143,7 @@ class ValueSensitivity:
         )
 
         self.expected_values_ = {}
-        successors = self._decisiontree._tree_nodes[self._idx].get("successors")
+        successors = self._decisiontree._children(self._idx)
         branch_names = [
             self._decisiontree._tree_nodes[successor].get("tag_branch")
             for successor in successors
@@ -152,7 +154,6 @@ class ValueSensitivity:
         for branch_value in self.branch_values_:
 
             self._set_branch_value(branch_value)
-            self._decisiontree.evaluate()
             self._decisiontree.rollback()
             expvals = [
                 self._decisiontree._tree_nodes[successor].get("EV")
@@ -172,6 +173,7 @@ class ValueSensitivity:
 
     def plot(self):
         """Plots the sensitivity to values"""
+        import matplotlib.pyplot as plt
 
         if isinstance(self.expected_values_, dict):
             for fmt, branch_name in zip(LINEFMTS, self.expected_values_.keys()):
@@ -185,10 +187,8 @@ class ValueSensitivity:
         else:
             plt.gca().plot(self.branch_values_, self.expected_values_, "-k")
 
-        plt.gca().spines["bottom"].set_visible(False)
-        plt.gca().spines["left"].set_visible(False)
-        plt.gca().spines["right"].set_visible(False)
-        plt.gca().spines["top"].set_visible(False)
-        plt.gca().set_ylabel("Expected values")
-        plt.gca().set_xlabel("Branch Values")
+        ax = plt.gca()
+        _style_axes(ax)
+        ax.set_ylabel("Expected values")
+        ax.set_xlabel("Branch Values")
         plt.grid()
@@ -2,6 +2,8 @@
 Risk profile
 
 """
+import pytest
+
 from smart_choice.decisiontree import DecisionTree
 from smart_choice.probabilistic_sensitivity import ProbabilisticSensitivity
 from smart_choice.examples import stguide, stbook
@@ -35,3 +37,12 @@ def test_stbook_fig_3_8_pag_55(capsys):
     print(sensitivity.df_.tail(42).head(21))
     print(sensitivity.df_.tail(21))
     check_capsys("./tests/files/stbook_fig_3_8_pag_55.txt", capsys)
+
+
+def test_probabilistic_sensitivity_before_evaluate():
+    """The tree must be evaluated before the sensitivity analysis"""
+
+    nodes = stguide()
+    tree = DecisionTree(nodes=nodes)
+    with pytest.raises(ValueError):
+        ProbabilisticSensitivity(decisiontree=tree, varname="competitor_bid")
@@ -3,8 +3,13 @@ Risk sensitivity tests
 
 """
 
+import warnings
+
+import pytest
+
+from smart_choice.datanodes import DataNodes
 from smart_choice.decisiontree import DecisionTree
-from smart_choice.examples import stguide
+from smart_choice.examples import oil_tree_example, stguide
 from smart_choice.risk_sensitivity import RiskAttitudeSensitivity
 
 from tests.capsys import check_capsys
@@ -33,3 +38,92 @@ def test_fig_7_19(capsys):
     )
     print(risk_sensitivity)
     check_capsys("./tests/files/stguide_fig_7_19.txt", capsys)
+
+
+def _certainty_equivalents(tree, idx, risk_aversions):
+    #
+    # Certainty equivalents of the node `idx` computed with a rollback for
+    # each risk aversion
+    #
+    ceqs = []
+    for risk_aversion in risk_aversions:
+        if risk_aversion == 0:
+            tree.rollback()
+            ceqs.append(tree._tree_nodes[idx]["EV"])
+        else:
+            tree.rollback(utility_fn="exp", risk_tolerance=1.0 / risk_aversion)
+            ceqs.append(tree._tree_nodes[idx]["CE"])
+    return ceqs
+
+
+def test_risk_sensitivity_decision_node():
+    """Risk sensitivity of a decision node other than the root"""
+
+    nodes = oil_tree_example()
+    tree = DecisionTree(nodes=nodes)
+    tree.evaluate()
+    risk_sensitivity = RiskAttitudeSensitivity(
+        tree, utility_fn="exp", risk_tolerance=1000, idx=2
+    )
+    assert risk_sensitivity.type_ == "DECISION"
+    assert risk_sensitivity.branch_names_ == ["drill", "dont-drill"]
+    for tag_branch, successor in zip(risk_sensitivity.branch_names_, [3, 7]):
+        ceqs = risk_sensitivity.certainty_equivalents_[tag_branch]
+        assert isinstance(ceqs, list)
+        assert ceqs == pytest.approx(
+            _certainty_equivalents(tree, successor, risk_sensitivity.risk_aversions_)
+        )
+
+
+def test_risk_sensitivity_chance_node():
+    """Risk sensitivity of a chance node"""
+
+    nodes = oil_tree_example()
+    tree = DecisionTree(nodes=nodes)
+    tree.evaluate()
+    risk_sensitivity = RiskAttitudeSensitivity(
+        tree, utility_fn="exp", risk_tolerance=1000, idx=1
+    )
+    assert risk_sensitivity.type_ == "CHANCE"
+    assert list(risk_sensitivity.df_.columns) == ["test_results", "Risk Tolerance"]
+    ceqs = risk_sensitivity.certainty_equivalents_
+    assert isinstance(ceqs, list)
+    assert ceqs == pytest.approx(
+        _certainty_equivalents(tree, 1, risk_sensitivity.risk_aversions_)
+    )
+
+
+def test_risk_sensitivity_warnings():
+    """The utility function is not evaluated for the risk neutral case"""
+
+    nodes = DataNodes()
+    nodes.add_decision(
+        name="invest",
+        branches=[("yes", 0, "market"), ("no", 0, "profit")],
+        maximize=True,
+    )
+    nodes.add_chance(
+        name="market",
+        branches=[("up", 0.6, 8000, "profit"), ("down", 0.4, -5000, "profit")],
+    )
+    nodes.add_terminal(
+        name="profit", payoff_fn=lambda values, **kwargs: sum(values.values())
+    )
+
+    for nodes, utility_fn, risk_tolerance in (
+        (nodes, "exp", 20000),
+        (stguide(), "log", 1000),
+        (oil_tree_example(), "log", 1000),
+    ):
+        tree = DecisionTree(nodes=nodes)
+        tree.evaluate()
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            risk_sensitivity = RiskAttitudeSensitivity(
+                tree, utility_fn=utility_fn, risk_tolerance=risk_tolerance
+            )
+        tree.rollback()
+        successors = tree._tree_nodes[0]["successors"]
+        for tag_branch, successor in zip(risk_sensitivity.branch_names_, successors):
+            ceqs = risk_sensitivity.certainty_equivalents_[tag_branch]
+            assert ceqs[0] == pytest.approx(tree._tree_nodes[successor]["EV"])
@@ -0,0 +1,223 @@
+"""
+Array representation of the tree
+
+The rollback is computed by the per-node kernel, by the NumPy rollback by
+levels (without numba) and by the kernel of several columns (with numba);
+these tests check that all of them give the same results.
+
+"""
+import numpy as np
+import pytest
+
+from smart_choice.decisiontree import (
+    TERMINAL,
+    DecisionTree,
+    _rollback_kernel,
+    _strategy_kernel,
+)
+from smart_choice.examples import (
+    oil_tree_example,
+    stbook,
+    stbook_dependent_outcomes,
+    stguide,
+    stguide_dependent_outcomes,
+    stguide_dependent_probabilities,
+)
+
+EXAMPLES = (
+    stguide,
+    stguide_dependent_probabilities,
+    stguide_dependent_outcomes,
+    stbook,
+    stbook_dependent_outcomes,
+    oil_tree_example,
+)
+
+
+def _rolled_back_trees():
+    #
+    # Trees of the examples rolled back with the expected value and with the
+    # expected utility, without forced branches, with the second branch of
+    # the root forced and with the first branch of the first chance node
+    # forced
+    #
+    for example in EXAMPLES:
+        for utility_fn in (None, "exp"):
+            for forced in (None, "root", "chance"):
+                tree = DecisionTree(nodes=example())
+                tree.evaluate()
+                if forced == "root":
+                    tree._tree_nodes[0]["forced_branch"] = 1
+                if forced == "chance":
+                    idx = tree._arrays.chance_nodes[0]
+                    tree._tree_nodes[idx]["forced_branch"] = 0
+                tree.rollback(utility_fn=utility_fn, risk_tolerance=1000)
+                yield tree, utility_fn is not None
+
+
+def _terminal_columns(tree, values, factors):
+    #
+    # Matrix with a column for each factor, with the values of the terminal
+    # nodes multiplied by the factor and NaN in the internal nodes
+    #
+    terminal = tree._arrays.type_ == TERMINAL
+    return np.where(terminal[:, np.newaxis], values[:, np.newaxis] * factors, np.nan)
+
+
+def _kernel_rollback(tree, ev, eu, use_exputl, kernel=_rollback_kernel):
+    #
+    # Rollback of a single column with the per-node kernel
+    #
+    arrays = tree._arrays
+    optimal_successor = np.full(len(ev), -1, dtype=np.int32)
+    kernel(
+        arrays.type_,
+        ev,
+        eu,
+        arrays.prob,
+        arrays.succ_flat,
+        arrays.succ_ptr,
+        arrays.forced_successor,
+        arrays.maximize,
+        optimal_successor,
+        use_exputl,
+    )
+    return optimal_successor
+
+
+def test_rollback_levels():
+    """NumPy rollback by levels and per-node kernel"""
+
+    for tree, use_exputl in _rolled_back_trees():
+        arrays = tree._arrays
+        ev = _terminal_columns(tree, arrays.ev, np.ones(1))
+        eu = _terminal_columns(tree, arrays.eu, np.ones(1)) if use_exputl else None
+        optimal_successor = np.full(len(ev), -1, dtype=np.int32)
+        tree._rollback_levels(
+            prob=arrays.prob[:, np.newaxis],
+            ev=ev,
+            eu=eu,
+            optimal_successor=optimal_successor,
+        )
+        np.testing.assert_array_equal(ev[:, 0], arrays.ev)
+        np.testing.assert_array_equal(optimal_successor, arrays.optimal_successor)
+        if use_exputl:
+            np.testing.assert_array_equal(eu[:, 0], arrays.eu)
+
+
+def test_rollback_columns():
+    """Rollback of several columns and per-node kernel"""
+
+    factors = np.array([1.0, 0.5, -2.0])
+    for tree, use_exputl in _rolled_back_trees():
+        arrays = tree._arrays
+        ev = _terminal_columns(tree, arrays.ev, factors)
+        eu = _terminal_columns(tree, arrays.eu, factors) if use_exputl else None
+        tree._rollback_columns(prob=arrays.prob[:, np.newaxis], ev=ev, eu=eu)
+
+        for k, factor in enumerate(factors):
+            expected_ev = _terminal_columns(tree, arrays.ev, factor)[:, 0]
+            expected_eu = _terminal_columns(tree, arrays.eu, factor)[:, 0]
+            _kernel_rollback(tree, expected_ev, expected_eu, use_exputl)
+            np.testing.assert_array_equal(ev[:, k], expected_ev)
+            if use_exputl:
+                np.testing.assert_array_equal(eu[:, k], expected_eu)
+
+
+def test_optimal_strategy():
+    """Optimal strategy and path probabilities computed from the tree nodes"""
+
+    for tree, _ in _rolled_back_trees():
+        tree_nodes = tree._tree_nodes
+        strategy = [False] * len(tree_nodes)
+        path_probs = {}
+        stack = [(0, 1.0)]
+        while stack:
+            idx, path_prob = stack.pop()
+            node = tree_nodes[idx]
+            strategy[idx] = True
+            path_prob *= node.get("tag_prob", 1.0)
+            if node["type"] == "TERMINAL":
+                path_probs[idx] = path_prob
+            elif node["forced_branch"] is not None:
+                successor = node["successors"][node["forced_branch"]]
+                stack.append((successor, path_prob))
+            elif node["type"] == "CHANCE":
+                for successor in node["successors"]:
+                    stack.append((successor, path_prob))
+            else:
+                stack.append((node["optimal_successor"], path_prob))
+
+        assert [node["optimal_strategy"] for node in tree_nodes] == strategy
+        for idx, path_prob in path_probs.items():
+            assert tree_nodes[idx]["PathProb"] == pytest.approx(path_prob)
+
+
+def test_numba_kernels():
+    """Compiled kernels and their Python versions"""
+
+    pytest.importorskip("numba")
+
+    for tree, use_exputl in _rolled_back_trees():
+        arrays = tree._arrays
+        ev = _terminal_columns(tree, arrays.ev, np.ones(1))[:, 0]
+        eu = _terminal_columns(tree, arrays.eu, np.ones(1))[:, 0]
+        optimal_successor = _kernel_rollback(
+            tree, ev, eu, use_exputl, kernel=_rollback_kernel.py_func
+        )
+        np.testing.assert_array_equal(ev, arrays.ev)
+        np.testing.assert_array_equal(optimal_successor, arrays.optimal_successor)
+        if use_exputl:
+            np.testing.assert_array_equal(eu, arrays.eu)
+
+        n_nodes = len(tree._tree_nodes)
+        optimal_strategy = np.zeros(n_nodes, dtype=bool)
+        optimal_strategy[0] = True
+        cum_prob = np.zeros(n_nodes)
+        cum_prob[0] = 1.0
+        prob = np.where(np.isnan(arrays.prob), 1.0, arrays.prob)
+        _strategy_kernel.py_func(
+            arrays.type_,
+            prob,
+            arrays.succ_flat,
+            arrays.succ_ptr,
+            arrays.forced_successor,
+            arrays.optimal_successor,
+            optimal_strategy,
+            cum_prob,
+        )
+        np.testing.assert_array_equal(optimal_strategy, arrays.optimal_strategy)
+        terminal_nodes = arrays.terminal_nodes
+        np.testing.assert_array_equal(
+            cum_prob[terminal_nodes] * prob[terminal_nodes],
+            arrays.path_prob[terminal_nodes],
+        )
+
+        factors = np.array([1.0, 0.5, -2.0])
+        ev = _terminal_columns(tree, arrays.ev, factors)
+        eu = _terminal_columns(tree, arrays.eu, factors) if use_exputl else None
+        expected_ev = ev.copy()
+        expected_eu = None if eu is None else eu.copy()
+        tree._rollback_columns(prob=arrays.prob[:, np.newaxis], ev=ev, eu=eu)
+        tree._rollback_levels(
+            prob=arrays.prob[:, np.newaxis], ev=expected_ev, eu=expected_eu
+        )
+        np.testing.assert_array_equal(ev, expected_ev)
+        if use_exputl:
+            np.testing.assert_array_equal(eu, expected_eu)
+
+
+def test_rollback_probabilities_before_evaluate():
+    """The tree must be evaluated before the rollback of several sets"""
+
+    tree = DecisionTree(nodes=stguide())
+    tree._load_probabilities()
+    prob = np.repeat(tree._arrays.prob[:, np.newaxis], 2, axis=1)
+    prob[tree._arrays.terminal_nodes, 1] = 0.5
+    with pytest.raises(ValueError, match="call evaluate"):
+        tree._rollback_probabilities(prob)
+
+    tree.evaluate()
+    ev = tree._rollback_probabilities(prob)
+    tree.rollback()
+    np.testing.assert_array_equal(ev[:, 0], tree._arrays.ev)
@@ -2,8 +2,12 @@
 Creation of tree without evaluation
 
 """
+import numpy as np
+import pytest
+
 from smart_choice.decisiontree import DecisionTree
 from smart_choice.examples import (
+    oil_tree_example,
     stguide,
     stguide_dependent_probabilities,
     stguide_dependent_outcomes,
@@ -59,3 +63,59 @@ def test_stbook_fig_4_5_pag_81(capsys):
     tree.rollback()
     tree.display()
     check_capsys("./tests/files/stbook_fig_4_5_pag_81.txt", capsys)
+
+
+def _outputs(tree, capsys):
+    #
+    # Text diagram, representation, expected value, certainty equivalent and
+    # plot of the tree after its evaluation and rollback
+    #
+    tree.display()
+    print(tree)
+    tree.evaluate()
+    tree.display()
+    expected_value = tree.rollback()
+    tree.display()
+    certainty_equivalent = tree.rollback(
+        view="ce", utility_fn="exp", risk_tolerance=1000
+    )
+    tree.display(view="ce")
+    return (
+        capsys.readouterr().out,
+        expected_value,
+        certainty_equivalent,
+        tree.plot().source,
+    )
+
+
+def test_rebuild(capsys):
+    """Rebuilt trees and new trees"""
+
+    for force in (False, True):
+        for example in (stguide, stbook_dependent_outcomes, oil_tree_example):
+            nodes = example()
+            expected = _outputs(DecisionTree(nodes=nodes), capsys)
+
+            tree = DecisionTree(nodes=nodes)
+            tree.evaluate()
+            tree._tree_nodes[0]["forced_branch"] = 1
+            tree.rollback(utility_fn="exp", risk_tolerance=500)
+            tree._risk_profile(0)
+            tree.plot()
+
+            tree.rebuild(force=force)
+            assert tree._risk_profiles is None
+            with pytest.raises(ValueError):
+                tree.rollback()
+            assert _outputs(tree, capsys) == expected
+
+
+def test_repr_read_only():
+    """Printing the tree does not modify it"""
+
+    nodes = stguide_dependent_probabilities()
+    tree = DecisionTree(nodes=nodes)
+    prob = tree._arrays.prob.copy()
+    text = repr(tree)
+    np.testing.assert_array_equal(tree._arrays.prob, prob)
+    assert repr(tree) == text
@@ -0,0 +1,76 @@
+"""
+Tree plots
+
+"""
+from graphviz import Digraph
+
+from smart_choice.decisiontree import DecisionTree
+from smart_choice.examples import stbook
+
+
+def test_plot_digraph():
+    """The plot is a graphviz Digraph that can be extended"""
+
+    nodes = stbook()
+    tree = DecisionTree(nodes=nodes)
+    tree.evaluate()
+    tree.rollback()
+    dot = tree.plot()
+    assert isinstance(dot, Digraph)
+    assert dot.source.startswith("digraph {\n\trankdir=LR\n")
+
+    dot.attr(label="stbook")
+    assert dot.source.endswith("\tlabel=stbook\n}\n")
+
+
+def _plot_source(nodes, evaluate=False, rollback=False, forced_branch=None):
+    #
+    # Plot of a new tree
+    #
+    tree = DecisionTree(nodes=nodes)
+    tree._tree_nodes[0]["forced_branch"] = forced_branch
+    if evaluate is True:
+        tree.evaluate()
+    if rollback is True:
+        tree.rollback()
+    return tree.plot().source
+
+
+def test_plot_cache():
+    """Cached plots are discarded when the tree changes"""
+
+    nodes = stbook()
+    tree = DecisionTree(nodes=nodes)
+    assert tree.plot().source == _plot_source(nodes)
+
+    tree.evaluate()
+    assert tree.plot().source == _plot_source(nodes, evaluate=True)
+
+    tree.rollback()
+    assert tree.plot().source == _plot_source(nodes, evaluate=True, rollback=True)
+    assert tree.plot(max_deep=2).source != tree.plot().source
+
+    tree._tree_nodes[0]["forced_branch"] = 0
+    tree.rollback()
+    assert tree.plot().source == _plot_source(
+        nodes, evaluate=True, rollback=True, forced_branch=0
+    )
+
+    tree.rebuild()
+    assert tree.plot().source == _plot_source(nodes)
+
+
+def test_plot_cache_copy():
+    """Changes in the returned plot do not change the cached plot"""
+
+    nodes = stbook()
+    tree = DecisionTree(nodes=nodes)
+    tree.evaluate()
+    tree.rollback()
+    source = tree.plot().source
+
+    dot = tree.plot()
+    dot.attr(label="stbook")
+    dot.node("extra")
+    assert dot.source != source
+    assert tree.plot().source == source
@@ -2,6 +2,9 @@
 Tree evaluation and rollback
 
 """
+import pytest
+
+from smart_choice.datanodes import DataNodes
 from smart_choice.decisiontree import DecisionTree
 from smart_choice.examples import stguide, stbook, oil_tree_example
 
@@ -82,3 +85,75 @@ def test_oilexample_pag_56(capsys):
     tree.rollback()
     tree.display(max_deep=3)
     check_capsys("./tests/files/oilexample_pag_56.txt", capsys)
+
+
+def test_stguide_forced_branch():
+    """Forced branch in the root decision node"""
+
+    nodes = stguide()
+    tree = DecisionTree(nodes=nodes)
+    tree.evaluate()
+    assert tree.rollback() == 65.0
+    assert tree._tree_nodes[0]["optimal_successor"] == 1
+
+    tree._tree_nodes[0]["forced_branch"] = 1
+    assert tree.rollback() == 45.0
+    assert tree._tree_nodes[0]["optimal_successor"] == 14
+    assert tree._tree_nodes[14]["optimal_strategy"] is True
+    assert tree._tree_nodes[1]["optimal_strategy"] is False
+
+    tree._tree_nodes[0]["forced_branch"] = None
+    assert tree.rollback() == 65.0
+
+
+def test_rollback_before_evaluate():
+    """The tree must be evaluated before the rollback"""
+
+    nodes = stguide()
+    tree = DecisionTree(nodes=nodes)
+    with pytest.raises(ValueError):
+        tree.rollback()
+
+
+def _product_nodes(vectorized, values):
+    def payoff_fn(**kwargs):
+        return kwargs["values"]["a"] * kwargs["values"]["b"]
+
+    nodes = DataNodes()
+    nodes.add_decision(
+        name="a",
+        branches=[("a1", values[0], "b"), ("a2", values[1], "b")],
+        maximize=True,
+    )
+    nodes.add_chance(
+        name="b",
+        branches=[("b1", 0.5, values[0], "profit"), ("b2", 0.5, values[1], "profit")],
+    )
+    nodes.add_terminal(name="profit", payoff_fn=payoff_fn, vectorized=vectorized)
+    return nodes
+
+
+def test_vectorized_payoff_fn():
+    """Vectorized payoff functions give the same values"""
+
+    for values in ([4, 3], [4.5, 3.5]):
+        results = []
+        for vectorized in (False, True):
+            tree = DecisionTree(nodes=_product_nodes(vectorized, values))
+            tree.evaluate()
+            results.append(
+                (
+                    tree.rollback(),
+                    [node.get("EV") for node in tree._tree_nodes],
+                )
+            )
+        assert results[0] == results[1]
+
+
+def test_payoff_fn_python_integers():
+    """Payoff functions receive the values of the branches unchanged"""
+
+    tree = DecisionTree(nodes=_product_nodes(False, [4_000_000_000, 3_000_000_000]))
+    tree.evaluate()
+    assert tree._tree_nodes[2]["EV"] == 16_000_000_000_000_000_000
+    assert tree.rollback() == 14_000_000_000_000_000_000